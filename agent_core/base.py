@@ -1,11 +1,14 @@
 from abc import ABC, abstractmethod
 import uuid
+from agent_core.metrics import current_trace_id
 
 class BaseAgent(ABC):
     def __init__(self, user_id):
         self.user_id = user_id
         # Required for Observability: unique ID to track each session
         self.trace_id = str(uuid.uuid4())
+        # Spans recorded while handling this request are attributed to the trace
+        current_trace_id.set(self.trace_id)
 
     @abstractmethod
     def process_request(self, message: str):
@@ -0,0 +1,171 @@
+import os
+import re
+import json
+from collections import defaultdict
+from mcp_server.search_index import COMMON_COLORS, STOP_WORDS, tokenize
+from agent_core.query_parser import CATEGORY_SYNONYMS
+from agent_core.tokens import estimate_tokens
+
+# Most closet items put into the stylist prompt (CLOSET_RETRIEVAL=0 sends the whole closet)
+CLOSET_RETRIEVAL = os.getenv("CLOSET_RETRIEVAL", "1") != "0"
+CLOSET_TOP_N = int(os.getenv("CLOSET_TOP_N", 12))
+
+# Where an item sits in an outfit, by (stemmed) name terms
+ROLE_TERMS = {
+    "top": {"shirt", "tee", "top", "polo", "sweater", "hoodie", "jacket", "blouse", "kurta", "blazer", "coat"},
+    "bottom": {"jean", "pant", "trouser", "chino", "short", "skirt", "jogger", "cargo"},
+    "footwear": {"sneaker", "shoe", "boot", "sandal", "loafer", "heel", "runner", "slide", "hightop", "lowtop", "midtop"},
+    "accessory": {"belt", "bag", "watch", "sunglass", "eyewear", "hat", "cap", "scarf", "aviator", "tote", "backpack"},
+}
+# A catalog category settles the role; name terms are only used without one
+CATEGORY_ROLES = {"footwear": "footwear", "accessories": "accessory"}
+
+# "High-Top Sneakers" is footwear, not a top
+_SHOE_CUT_RE = re.compile(r"\b(high|low|mid)[\s-]?tops?\b")
+
+# A request about one role is answered with items from these
+COMPLEMENTS = {
+    "top": ("bottom", "footwear", "accessory"),
+    "bottom": ("top", "footwear", "accessory"),
+    "footwear": ("bottom", "top", "accessory"),
+    "accessory": ("top", "bottom", "footwear"),
+}
+
+# Question words that say nothing about which items matter
+STYLING_WORDS = {"what", "goe", "go", "wear", "my", "should", "style", "styling", "match", "look",
+                 "advice", "pair", "outfit", "can", "do", "it", "and", "to", "on", "in", "how"}
+
+# Fields the stylist needs; price, brand, size etc. are dropped from the prompt
+COMPACT_FIELDS = ("title", "color", "category", "sub_category", "material")
+MAX_COMPACT_KEYWORDS = 3
+
+
+def _terms(text: str) -> list:
+    return tokenize(_SHOE_CUT_RE.sub(r"\1top", text.lower()))
+
+
+def _item_color(item: dict, tokens: set):
+    color = str(item.get("color") or item.get("colour") or "").lower()
+    if color:
+        return color
+    return next((c for c in tokens if c in COMMON_COLORS), None)
+
+
+def _item_category(item: dict):
+    raw = str(item.get("category") or item.get("type") or "").lower().strip()
+    return CATEGORY_SYNONYMS.get(raw, raw) or None
+
+
+class ClosetIndex:
+    """
+    One user's closet indexed by outfit role, colour and name/keyword terms,
+    for picking the items relevant to a styling question.
+    """
+
+    def __init__(self, items: list):
+        self.items = items
+        self.name_terms = []     # per item: title + sub_category terms
+        self.keyword_terms = []  # per item: style_keywords + material terms
+        self.colors = []
+        self.roles = []
+        self.by_role = defaultdict(list)
+        for i, item in enumerate(items):
+            name = set(_terms(f"{item.get('title', '')} {item.get('sub_category', '')}"))
+            keywords = set(tokenize(" ".join(map(str, item.get("style_keywords") or [])) + f" {item.get('material', '')}"))
+            color = _item_color(item, name | keywords)
+            category = _item_category(item)
+            role = CATEGORY_ROLES.get(category) or next((r for r, terms in ROLE_TERMS.items() if name & terms), None)
+            self.name_terms.append(name)
+            self.keyword_terms.append(keywords)
+            self.colors.append(color)
+            self.roles.append(role)
+            self.by_role[role].append(i)
+
+    def _relevance(self, i: int, terms: set, colors: set) -> int:
+        score = 3 * len(terms & self.name_terms[i]) + len(terms & self.keyword_terms[i])
+        if self.colors[i] in colors:
+            score += 2
+        return score
+
+    def select(self, message: str, limit: int = None) -> list:
+        """
+        Up to `limit` items for `message`: the items it names ("my blue jeans"),
+        best match first, then items from the complementary roles (tops, shoes,
+        accessories for jeans), interleaved so every role is represented.
+        """
+        limit = limit or CLOSET_TOP_N
+        terms = set(_terms(message)) - STOP_WORDS - STYLING_WORDS
+        colors = terms & COMMON_COLORS
+        garment_terms = {t for t in terms if any(t in role_terms for role_terms in ROLE_TERMS.values())}
+        asked_roles = {r for r, role_terms in ROLE_TERMS.items() if garment_terms & role_terms}
+        # Occasion/style words ("beach", "formal") rank the complementary items
+        context_terms = terms - colors - garment_terms
+
+        if garment_terms:
+            # The named garment(s), best colour/keyword match first
+            named = [i for i in range(len(self.items)) if self.name_terms[i] & garment_terms]
+            if colors:
+                # "my blue jeans" means the blue ones, if there are any
+                named = [i for i in named if self.colors[i] in colors] or named
+            anchors = sorted(named, key=lambda i: -self._relevance(i, terms, colors))[:max(1, limit // 4)]
+            roles = [r for asked in asked_roles for r in COMPLEMENTS[asked] if r not in asked_roles]
+        else:
+            # General question ("what to wear to a beach party"): a sample of every role
+            anchors = []
+            roles = list(ROLE_TERMS) + [None]
+
+        chosen = list(anchors)
+        seen = set(chosen)
+        queues = []
+        for role in dict.fromkeys(roles):
+            queue = sorted((i for i in self.by_role.get(role, []) if i not in seen),
+                           key=lambda i: -self._relevance(i, context_terms, colors if not garment_terms else set()))
+            if queue:
+                queues.append(queue)
+        # Round-robin over roles, best match first within each
+        while queues and len(chosen) < limit:
+            for queue in list(queues):
+                if len(chosen) >= limit:
+                    break
+                chosen.append(queue.pop(0))
+                if not queue:
+                    queues.remove(queue)
+        return [self.items[i] for i in chosen]
+
+
+def compact_item(item: dict) -> dict:
+    """The fields of a closet item worth spending prompt tokens on."""
+    compact = {"id": item.get("product_id")}
+    for field in COMPACT_FIELDS:
+        value = item.get(field)
+        if field == "category":
+            value = value or item.get("type")
+        if field == "color":
+            value = value or item.get("colour")
+        if value:
+            compact[field] = value
+    keywords = [k for k in (item.get("style_keywords") or []) if k != compact.get("color")]
+    if keywords:
+        compact["keywords"] = keywords[:MAX_COMPACT_KEYWORDS]
+    return compact
+
+
+def closet_context(closet: list, message: str, limit: int = None):
+    """
+    Returns (prompt text, selected items, stats): the items relevant to
+    `message` in compact JSON, and token estimates for the full closet vs
+    what is sent.
+    """
+    full_text = json.dumps(closet)
+    if CLOSET_RETRIEVAL:
+        selected = ClosetIndex(closet).select(message, limit)
+        text = json.dumps([compact_item(item) for item in selected], separators=(",", ":"))
+    else:
+        selected, text = closet, full_text
+    stats = {
+        "items_total": len(closet),
+        "items_sent": len(selected),
+        "tokens_full": estimate_tokens(full_text) if closet else 0,
+        "tokens_sent": estimate_tokens(text) if selected else 0,
+    }
+    return text, selected, stats
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CLOSET_CACHE_SIZE = int(os.getenv("CLOSET_CACHE_SIZE", 1024))
+# Cached closets are re-read after this long, so writes made by other
+# workers/processes show up without a restart
+CLOSET_CACHE_TTL = float(os.getenv("CLOSET_CACHE_TTL", 60))
+
+
+class ClosetStore:
+    """
+    Per-user wardrobes in SQLite, one row per (user_id, product_id), with an
+    in-process LRU cache of parsed closets.
+
+    Reading a closet costs one indexed query (or nothing on a cache hit), no
+    matter how many users exist. add_item/remove_item/replace update one user
+    and invalidate only that user's cache entry. data/closet.json (a map of
+    user_id -> items) is checked for new users when its content changes; a
+    user the store already owns (imported before, or written through the
+    store) is never overwritten from the file, so API edits stick.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS closet_items (
+            user_id TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            item TEXT NOT NULL,
+            added_at REAL NOT NULL,
+            PRIMARY KEY (user_id, product_id)
+        );
+        CREATE TABLE IF NOT EXISTS closet_users (
+            user_id TEXT PRIMARY KEY
+        );
+        -- Closets stored before closet_users existed belong to the store too
+        INSERT OR IGNORE INTO closet_users SELECT DISTINCT user_id FROM closet_items;
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path: str = None, json_path: str = None, cache_size: int = None,
+                 cache_ttl: float = None, check_interval: float = None):
+        self.path = path or os.getenv("CLOSET_DB_PATH") or os.path.join("data", "closet.db")
+        self.json_path = json_path if json_path is not None else os.path.join("data", "closet.json")
+        self.cache_size = cache_size or CLOSET_CACHE_SIZE
+        self.cache_ttl = cache_ttl if cache_ttl is not None else CLOSET_CACHE_TTL
+        self.check_interval = check_interval if check_interval is not None \
+            else float(os.getenv("CLOSET_RELOAD_INTERVAL", 1.0))
+        self._cache = OrderedDict()  # user_id -> (loaded_at, items)
+        self._cache_lock = threading.Lock()
+        self._local = threading.local()
+        self._json_stat = None
+        self._last_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn().executescript(self.SCHEMA)
+        self._import_json()
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections are not shareable)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _write_closet(conn, user_id: str, items: list):
+        """Replace one user's rows (items without a product_id are skipped)."""
+        now = time.time()
+        conn.execute("INSERT OR IGNORE INTO closet_users VALUES (?)", (user_id,))
+        conn.execute("DELETE FROM closet_items WHERE user_id = ?", (user_id,))
+        # Microsecond offsets keep the given order in ORDER BY added_at
+        conn.executemany("INSERT OR REPLACE INTO closet_items VALUES (?, ?, ?, ?)",
+                         [(user_id, str(item["product_id"]), json.dumps(item), now + i * 1e-6)
+                          for i, item in enumerate(items) if isinstance(item, dict) and item.get("product_id")])
+
+    def _import_json(self):
+        """
+        Import the closet.json users the store doesn't own yet, if the file
+        changed since the last import (checked at most once per check_interval).
+        """
+        self._last_check = time.monotonic()
+        try:
+            stat = os.stat(self.json_path)
+        except FileNotFoundError:
+            return
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key == self._json_stat:
+            return
+        self._json_stat = stat_key
+
+        with open(self.json_path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        try:
+            data = json.loads(raw) if raw.strip() else {}
+        except json.JSONDecodeError as e:
+            logger.warning("Ignoring unreadable %s: %s", self.json_path, e)
+            return
+        if not isinstance(data, dict):
+            # A bare list has no owner; it used to be handed to every user
+            if data:
+                logger.warning("Ignoring %s: expected a map of user_id -> items, got %s",
+                               self.json_path, type(data).__name__)
+            return
+
+        def load(conn):
+            row = conn.execute("SELECT value FROM meta WHERE key = 'closet_json_digest'").fetchone()
+            if row and row[0] == digest:
+                return []
+            new_users = [user_id for user_id in data if not conn.execute(
+                "SELECT 1 FROM closet_users WHERE user_id = ?", (user_id,)).fetchone()]
+            for user_id in new_users:
+                self._write_closet(conn, user_id, data[user_id] or [])
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('closet_json_digest', ?)", (digest,))
+            if row and len(new_users) < len(data):
+                # The file changed after an earlier import: edits to users already owned are ignored
+                logger.warning("%s is newer than %s; its entries for %d existing users were not re-imported "
+                               "(edit those closets through the /closet API)",
+                               self.json_path, self.path, len(data) - len(new_users))
+            return new_users
+
+        new_users = self._transaction(load)
+        if new_users:
+            with self._cache_lock:
+                for user_id in new_users:
+                    self._cache.pop(user_id, None)
+            logger.info("Imported closets for %d new users from %s", len(new_users), self.json_path)
+
+    def get(self, user_id: str) -> list:
+        """The user's closet items in the order they were added (empty if none)."""
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self._import_json()
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and now - entry[0] < self.cache_ttl:
+                self._cache.move_to_end(user_id)
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+
+        rows = self._conn().execute(
+            "SELECT item FROM closet_items WHERE user_id = ? ORDER BY added_at, rowid", (user_id,)
+        ).fetchall()
+        items = [json.loads(row[0]) for row in rows]
+        with self._cache_lock:
+            self._cache[user_id] = (now, items)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return list(items)
+
+    def _invalidate(self, user_id: str):
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
+
+    def add_item(self, user_id: str, item: dict) -> int:
+        """Add (or replace, by product_id) one item; returns the closet size."""
+        product_id = item.get("product_id")
+        if not product_id:
+            raise ValueError("closet item needs a product_id")
+
+        def write(conn):
+            conn.execute("INSERT OR IGNORE INTO closet_users VALUES (?)", (user_id,))
+            conn.execute(
+                "INSERT INTO closet_items VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, product_id) DO UPDATE SET item = excluded.item",
+                (user_id, str(product_id), json.dumps(item), time.time())
+            )
+            return conn.execute("SELECT COUNT(*) FROM closet_items WHERE user_id = ?", (user_id,)).fetchone()[0]
+        count = self._transaction(write)
+        self._invalidate(user_id)
+        return count
+
+    def remove_item(self, user_id: str, product_id: str) -> bool:
+        """Remove one item; False if the user didn't have it."""
+        def write(conn):
+            # Emptying a closet must not let the file's copy come back on the next import
+            conn.execute("INSERT OR IGNORE INTO closet_users VALUES (?)", (user_id,))
+            return conn.execute(
+                "DELETE FROM closet_items WHERE user_id = ? AND product_id = ?", (user_id, str(product_id))
+            ).rowcount > 0
+        removed = self._transaction(write)
+        self._invalidate(user_id)
+        return removed
+
+    def replace(self, user_id: str, items: list):
+        """Replace the user's whole closet."""
+        self._transaction(lambda conn: self._write_closet(conn, user_id, items))
+        self._invalidate(user_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._cache_lock:
+            cached = len(self._cache)
+        return {
+            "path": self.path,
+            "cached_users": cached,
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_closet_store = None
+
+
+def get_closet_store() -> ClosetStore:
+    """Return the process-wide closet store, creating it on first use."""
+    global _closet_store
+    if _closet_store is None:
+        _closet_store = ClosetStore()
+    return _closet_store
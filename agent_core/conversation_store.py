@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from agent_core.tokens import estimate_message_tokens
+
+
+class _Session:
+    def __init__(self):
+        self.turns = deque()
+        self.tokens = 0
+        self.message_count = 0  # every message ever appended, including trimmed ones
+        self.state = {}  # structured summary of the session (agent_core.session_state)
+        self.created_at = time.time()
+        self.last_access = time.monotonic()
+
+
+class ConversationStore(ABC):
+    """
+    Bounded per-session chat history.
+
+    - At most `max_sessions` sessions are kept; the least recently used is evicted.
+    - Sessions idle for longer than `idle_ttl` seconds are dropped.
+    - Each session keeps only the newest turns that fit in `max_history_tokens`
+      (estimated), so one long chat can't grow without limit either.
+    - Each session also carries a small structured `state` (constraints,
+      liked/rejected products) that older turns are folded into.
+    """
+
+    def __init__(self, max_sessions: int = None, idle_ttl: float = None, max_history_tokens: int = None):
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_SESSIONS", 10000))
+        self.idle_ttl = idle_ttl or float(os.getenv("SESSION_IDLE_TTL", 6 * 3600))
+        self.max_history_tokens = max_history_tokens or int(os.getenv("SESSION_HISTORY_TOKENS", 2000))
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+
+    @abstractmethod
+    def history(self, session_id: str) -> list:
+        """Return the retained turns of a session, oldest first."""
+        pass
+
+    @abstractmethod
+    def append(self, session_id: str, role: str, content: str):
+        pass
+
+    @abstractmethod
+    def message_count(self, session_id: str) -> int:
+        pass
+
+    @abstractmethod
+    def get_state(self, session_id: str) -> dict:
+        """The session's structured state ({} for a new or expired session)."""
+        pass
+
+    @abstractmethod
+    def set_state(self, session_id: str, state: dict):
+        pass
+
+    @abstractmethod
+    def clear(self, session_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def stats(self, session_id: str = None) -> dict:
+        """Per-session stats, or store-wide stats when no session is given."""
+        pass
+
+    async def call(self, method: str, *args):
+        """Run a store method from async code (backends that block run it off the event loop)."""
+        return getattr(self, method)(*args)
+
+    def _store_stats(self, sessions: int) -> dict:
+        return {
+            "backend": self.backend_name,
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            "max_history_tokens": self.max_history_tokens,
+            "evicted_lru": self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+        }
+
+
+class InMemoryConversationStore(ConversationStore):
+    """History held in this process's memory (single-worker deployments)."""
+
+    backend_name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, session_id, create=False):
+        """Look up a live session and mark it most recently used."""
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is not None and now - session.last_access > self.idle_ttl:
+            del self._sessions[session_id]
+            self.evicted_idle += 1
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = _Session()
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest-accessed sessions sit at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted_idle += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted_lru += 1
+
+    def history(self, session_id: str) -> list:
+        with self._lock:
+            session = self._get(session_id)
+            return list(session.turns) if session else []
+
+    def append(self, session_id: str, role: str, content: str):
+        with self._lock:
+            session = self._get(session_id, create=True)
+            turn = {"role": role, "content": content}
+            session.turns.append(turn)
+            session.tokens += estimate_message_tokens(turn)
+            session.message_count += 1
+            # Trim oldest turns to the token budget (always keep the newest one),
+            # and never start the history on an assistant turn
+            while len(session.turns) > 1 and (
+                session.tokens > self.max_history_tokens or session.turns[0]["role"] == "assistant"
+            ):
+                session.tokens -= estimate_message_tokens(session.turns.popleft())
+            self._evict()
+
+    def message_count(self, session_id: str) -> int:
+        with self._lock:
+            session = self._get(session_id)
+            return session.message_count if session else 0
+
+    def get_state(self, session_id: str) -> dict:
+        with self._lock:
+            session = self._get(session_id)
+            return dict(session.state) if session else {}
+
+    def set_state(self, session_id: str, state: dict):
+        with self._lock:
+            self._get(session_id, create=True).state = dict(state)
+            self._evict()
+
+    def clear(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self, session_id: str = None) -> dict:
+        with self._lock:
+            if session_id is None:
+                return self._store_stats(len(self._sessions))
+            session = self._get(session_id)
+            if session is None:
+                return {"message_count": 0, "retained_messages": 0, "estimated_tokens": 0}
+            return {
+                "message_count": session.message_count,
+                "retained_messages": len(session.turns),
+                "estimated_tokens": session.tokens,
+                "created_at": session.created_at,
+                "state": dict(session.state),
+            }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    History in a shared SQLite (WAL) file, so every uvicorn worker process
+    sees the same sessions: consecutive turns can land on any worker and
+    /agents/clear clears the session everywhere.
+    """
+
+    backend_name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+        CREATE TABLE IF NOT EXISTS turns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id);
+        CREATE TABLE IF NOT EXISTS session_state (
+            session_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL
+        );
+    """
+
+    # Sweeping expired/over-cap sessions is a table scan; do it at most this often
+    EVICT_INTERVAL = 30.0
+
+    def __init__(self, path: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or os.getenv("SESSION_DB_PATH") or os.path.join("data", "sessions.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._last_evict = 0.0
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections are not shareable)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    async def call(self, method: str, *args):
+        # sqlite3 blocks (and may wait on busy_timeout); keep it off the event loop
+        return await asyncio.to_thread(getattr(self, method), *args)
+
+    def _transaction(self, fn, write: bool = True):
+        """Run fn(conn) in one transaction; reads use a deferred one and take no write lock."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _live_session(self, conn, session_id, now, touch: bool = False):
+        """
+        Return (message_count, tokens, created_at) of a non-expired session.
+        Writers pass touch=True to bump last_access (and drop an expired
+        session); readers only look, and leave expired rows to the sweep.
+        """
+        row = conn.execute(
+            "SELECT message_count, tokens, created_at, last_access FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[3] > self.idle_ttl:
+            if touch:
+                self._delete(conn, session_id)
+                self.evicted_idle += 1
+            return None
+        if touch:
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        return row[:3]
+
+    @staticmethod
+    def _delete(conn, session_id):
+        conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+        return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def history(self, session_id: str) -> list:
+        def read(conn):
+            if self._live_session(conn, session_id, time.time()) is None:
+                return []
+            rows = conn.execute(
+                "SELECT role, content FROM turns WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            return [{"role": role, "content": content} for role, content in rows]
+        return self._transaction(read, write=False)
+
+    def append(self, session_id: str, role: str, content: str):
+        turn = {"role": role, "content": content}
+        tokens = estimate_message_tokens(turn)
+
+        def write(conn):
+            now = time.time()
+            if self._live_session(conn, session_id, now, touch=True) is None:
+                conn.execute("INSERT INTO sessions VALUES (?, 0, 0, ?, ?)", (session_id, now, now))
+            conn.execute("INSERT INTO turns (session_id, role, content, tokens) VALUES (?, ?, ?, ?)",
+                         (session_id, role, content, tokens))
+            conn.execute(
+                "UPDATE sessions SET message_count = message_count + 1, tokens = tokens + ? WHERE session_id = ?",
+                (tokens, session_id)
+            )
+            # Trim oldest turns to the token budget (always keep the newest one),
+            # and never start the history on an assistant turn
+            rows = conn.execute(
+                "SELECT id, role, tokens FROM turns WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            total = sum(r[2] for r in rows)
+            drop = []
+            while len(rows) - len(drop) > 1:
+                first = rows[len(drop)]
+                if total <= self.max_history_tokens and first[1] != "assistant":
+                    break
+                drop.append(first[0])
+                total -= first[2]
+            if drop:
+                conn.executemany("DELETE FROM turns WHERE id = ?", [(i,) for i in drop])
+                conn.execute("UPDATE sessions SET tokens = ? WHERE session_id = ?", (total, session_id))
+            if now - self._last_evict >= self.EVICT_INTERVAL:
+                self._last_evict = now
+                self._evict(conn, now)
+        self._transaction(write)
+
+    def _evict(self, conn, now):
+        expired = [r[0] for r in conn.execute(
+            "SELECT session_id FROM sessions WHERE last_access < ?", (now - self.idle_ttl,)
+        ).fetchall()]
+        for session_id in expired:
+            self._delete(conn, session_id)
+        self.evicted_idle += len(expired)
+        excess = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if excess > 0:
+            oldest = [r[0] for r in conn.execute(
+                "SELECT session_id FROM sessions ORDER BY last_access LIMIT ?", (excess,)
+            ).fetchall()]
+            for session_id in oldest:
+                self._delete(conn, session_id)
+            self.evicted_lru += len(oldest)
+
+    def message_count(self, session_id: str) -> int:
+        row = self._transaction(lambda conn: self._live_session(conn, session_id, time.time()), write=False)
+        return row[0] if row else 0
+
+    def get_state(self, session_id: str) -> dict:
+        def read(conn):
+            if self._live_session(conn, session_id, time.time()) is None:
+                return {}
+            row = conn.execute("SELECT state FROM session_state WHERE session_id = ?", (session_id,)).fetchone()
+            return json.loads(row[0]) if row else {}
+        return self._transaction(read, write=False)
+
+    def set_state(self, session_id: str, state: dict):
+        def write(conn):
+            now = time.time()
+            if self._live_session(conn, session_id, now, touch=True) is None:
+                conn.execute("INSERT INTO sessions VALUES (?, 0, 0, ?, ?)", (session_id, now, now))
+            conn.execute(
+                "INSERT INTO session_state VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state",
+                (session_id, json.dumps(state, separators=(",", ":")))
+            )
+        self._transaction(write)
+
+    def clear(self, session_id: str) -> bool:
+        return self._transaction(lambda conn: self._delete(conn, session_id))
+
+    def stats(self, session_id: str = None) -> dict:
+        if session_id is None:
+            count = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return {**self._store_stats(count), "path": self.path}
+
+        def read(conn):
+            row = self._live_session(conn, session_id, time.time())
+            if row is None:
+                return {"message_count": 0, "retained_messages": 0, "estimated_tokens": 0}
+            retained = conn.execute("SELECT COUNT(*) FROM turns WHERE session_id = ?", (session_id,)).fetchone()[0]
+            state = conn.execute("SELECT state FROM session_state WHERE session_id = ?", (session_id,)).fetchone()
+            return {
+                "message_count": row[0],
+                "retained_messages": retained,
+                "estimated_tokens": row[1],
+                "created_at": row[2],
+                "state": json.loads(state[0]) if state else {},
+            }
+        return self._transaction(read, write=False)
+
+
+def create_conversation_store(backend: str = None) -> ConversationStore:
+    """Build the store selected by SESSION_BACKEND ("memory" or "sqlite")."""
+    backend = (backend or os.getenv("SESSION_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return InMemoryConversationStore()
+    if backend == "sqlite":
+        return SQLiteConversationStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+import threading
+
+# Total time one agent request may take, and per-stage caps within it
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", 20))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 8))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", 3))
+
+
+class DeadlineExceeded(TimeoutError):
+    """A stage ran out of its share of the request deadline."""
+
+
+class CircuitOpenError(Exception):
+    """The upstream is marked unhealthy; the call was rejected without being made."""
+
+
+class Deadline:
+    """
+    Wall-clock budget for one request. Each stage asks for a timeout that is
+    the smaller of its own cap and what is left, optionally keeping `reserve`
+    seconds back for the stages that still have to run after it.
+    """
+
+    def __init__(self, seconds: float = None):
+        self.budget = seconds or REQUEST_DEADLINE_SECONDS
+        self.expires_at = time.monotonic() + self.budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float = None, reserve: float = 0.0) -> float:
+        """Seconds a stage may take; raises DeadlineExceeded if nothing is left for it."""
+        timeout = self.remaining() - reserve
+        if cap is not None:
+            timeout = min(timeout, cap)
+        if timeout <= 0:
+            raise DeadlineExceeded("request deadline exhausted")
+        return timeout
+
+    async def run(self, awaitable, cap: float = None, reserve: float = 0.0, stage: str = "stage"):
+        """Await `awaitable` within this stage's timeout."""
+        try:
+            timeout = self.timeout(cap, reserve)
+        except DeadlineExceeded:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()  # never started; avoid the "never awaited" warning
+            raise DeadlineExceeded(f"{stage}: request deadline exhausted")
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{stage} exceeded its {timeout:.2f}s budget")
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is unhealthy.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    every call is rejected for `reset_timeout` seconds. Then a single probe
+    call is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+        self.reset_timeout = reset_timeout or float(os.getenv("CIRCUIT_RESET_SECONDS", 30))
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_started = None
+            if self.state == "half_open":
+                # One probe at a time; a probe that never reported back is replaced
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go ahead."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+    def release_probe(self):
+        """A call ended without telling us anything about the upstream; let another probe through."""
+        with self._lock:
+            if self.state == "half_open":
+                self._probe_started = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_seconds": self.reset_timeout,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
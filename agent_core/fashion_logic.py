@@ -1,41 +1,43 @@
 import os
 import json
-from openai import OpenAI
+import logging
 from agent_core.base import BaseAgent
+from agent_core.llm import get_llm_client
+from agent_core.deadline import Deadline, LLM_TIMEOUT_SECONDS
+from agent_core.metrics import metrics
+from agent_core.closet_retrieval import closet_context
+from agent_core.closet_store import get_closet_store
+
+logger = logging.getLogger(__name__)
+
+# Faster model for quick advice
+STYLIST_MODEL = os.getenv("STYLIST_MODEL", "llama-3.1-8b-instant")
 
 class FashionStylistAgent(BaseAgent):
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, deadline: Deadline = None):
         super().__init__(user_id)
-        # Using Groq for high-speed style advice
-        self.client = OpenAI(
-            api_key=os.getenv("GROQ_API_KEY") or os.getenv("OPENAI_API_KEY"),
-            base_url="https://api.groq.com/openai/v1"
-        )
+        self.deadline = deadline  # Per-request time budget; a fresh REQUEST_DEADLINE_SECONDS one if None
+        # Using Groq for high-speed style advice (shared async client)
+        self.llm = get_llm_client()
 
     def _load_closet(self):
         """Helper to load the user's current wardrobe."""
-        path = os.path.join("data", "closet.json")
-        if not os.path.exists(path):
-            return []
-        try:
-            with open(path, "r") as f:
-                data = json.load(f)
-                # If data is a list (fallback), we might need to handle it
-                if isinstance(data, list):
-                    return data # Basic fallback
-                return data.get(self.user_id, [])
-        except (json.JSONDecodeError, AttributeError):
-            return []
+        return get_closet_store().get(self.user_id)
 
     async def process_request(self, message: str):
         """
         Async implementation to match the ShoppingAgent signature.
         """
+        deadline = self.deadline or Deadline()
+
         # 1. Fetch user's existing clothes
         closet = self._load_closet()
-        closet_summary = json.dumps(closet) if closet else "Empty Wardrobe"
+        # Only the items relevant to this question, with the fields the stylist uses
+        closet_summary, selected, closet_stats = closet_context(closet, message)
+        if not closet:
+            closet_summary = "Empty Wardrobe"
         
-        print(f"[TRACE {self.trace_id}] Analyzing style with closet items: {len(closet)}")
+        logger.info("Analyzing style with %d of %d closet items", len(selected), len(closet), extra=closet_stats)
 
         # 2. Reasoning: Match the request with owned items using LLM
         try:
@@ -55,13 +57,14 @@ class FashionStylistAgent(BaseAgent):
                 "}"
             )
 
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant", # Faster model for quick advice
+            response = await self.llm.chat_completion(
+                model=STYLIST_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": message}
                 ],
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                timeout=deadline.timeout(LLM_TIMEOUT_SECONDS)
             )
             
             brain = json.loads(response.choices[0].message.content)
@@ -71,19 +74,24 @@ class FashionStylistAgent(BaseAgent):
             # Map referenced IDs back to full items for the UI
             referenced_items = [i for i in closet if i.get("product_id") in referenced_ids]
 
+            metrics.inc("hushh_agent_requests_total", agent="stylist", outcome="ok")
             return {
                 "agent": "fashion_stylist_agent",
                 "trace_id": self.trace_id,
                 "understood_request": {"intent": "styling_advice"},
                 "results": [{"advice": advice, "owned_items_referenced": referenced_items}],
-                "next_actions": [{"action": "VIEW_STYLING_GUIDE"}]
+                "next_actions": [{"action": "VIEW_STYLING_GUIDE"}],
+                "closet_context": closet_stats
             }
 
         except Exception as e:
-            print(f"[ERROR] FashionStylistAgent LLM failure: {e}")
+            logger.error("FashionStylistAgent LLM failure: %s", e)
+            metrics.inc("hushh_agent_requests_total", agent="stylist", outcome="degraded")
             return {
                 "agent": "fashion_stylist_agent",
                 "trace_id": self.trace_id,
-                "error": str(e),
-                "results": [{"advice": "Styling service temporarily unavailable.", "owned_items_referenced": []}]
+                "error": str(e) or type(e).__name__,
+                "degraded": ["llm"],
+                "results": [{"advice": "Styling service temporarily unavailable.", "owned_items_referenced": []}],
+                "closet_context": closet_stats
             }
@@ -25,15 +25,15 @@ async def live_test():
     
     try:
         # We manually call the LLM part of process_request to verify the key
-        # using the _build_system_prompt and self.client
-        system_prompt = agent._build_system_prompt([])
+        # using the _build_system_prompt and the shared LLM client
+        system_prompt = agent._build_system_prompt(is_first_message=True)
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": test_message}
         ]
         
         print("Waiting for Groq response...")
-        response = agent.client.chat.completions.create(
+        response = await agent.llm.chat_completion(
             model="llama-3.3-70b-versatile",
             messages=messages,
             response_format={"type": "json_object"}
@@ -0,0 +1,105 @@
+import os
+import asyncio
+import httpx
+from openai import AsyncOpenAI
+from agent_core.deadline import CircuitBreaker
+from agent_core.metrics import metrics
+
+# Any OpenAI-compatible chat/completions endpoint (Groq by default; see loadtest/llm_stub.py)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+
+
+class LLMClient:
+    """
+    Process-wide async chat-completions client.
+
+    One keep-alive HTTP connection pool is shared by every agent, and a
+    semaphore caps in-flight completions (LLM_MAX_CONCURRENCY). Requests
+    over the cap wait for a free slot instead of failing. A circuit breaker
+    rejects calls outright while the upstream keeps failing or timing out.
+    """
+
+    def __init__(self, max_concurrency: int = None, max_connections: int = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+        max_connections = max_connections or int(os.getenv("LLM_MAX_CONNECTIONS", self.max_concurrency))
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_SECONDS", 60)),
+            ),
+            timeout=httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", 60)), connect=10.0),
+        )
+        self._client = AsyncOpenAI(
+            api_key=os.getenv("GROQ_API_KEY") or os.getenv("OPENAI_API_KEY"),
+            base_url=LLM_BASE_URL,
+            http_client=self._http,
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.breaker = CircuitBreaker("llm")
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def chat_completion(self, timeout: float = None, **kwargs):
+        """
+        Run a chat completion, queueing while the concurrency cap is reached.
+        `timeout` bounds the wait plus the call; raises CircuitOpenError without
+        calling out while the breaker is open. Only errors from the upstream
+        call count against the breaker, not time spent in the local queue or a
+        call cut short by the caller's deadline/cancellation.
+        """
+        self.breaker.check()
+        try:
+            async with asyncio.timeout(timeout):
+                self.waiting += 1
+                try:
+                    with metrics.span("llm.queue"):
+                        await self._semaphore.acquire()
+                finally:
+                    self.waiting -= 1
+                self.in_flight += 1
+                try:
+                    with metrics.span("llm.completion"):
+                        response = await self._client.chat.completions.create(**kwargs)
+                except Exception:
+                    # API errors and the HTTP client's own timeouts; a local
+                    # deadline arrives here as CancelledError and is not counted
+                    self.breaker.record_failure()
+                    raise
+                finally:
+                    self.in_flight -= 1
+                    self._semaphore.release()
+        except BaseException:
+            # No verdict on the upstream (queue timeout, cancelled): a
+            # half-open probe that ended this way must not block the next one
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            model = kwargs.get("model", "unknown")
+            metrics.inc("hushh_llm_tokens_total", usage.prompt_tokens or 0, model=model, kind="prompt")
+            metrics.inc("hushh_llm_tokens_total", usage.completion_tokens or 0, model=model, kind="completion")
+        return response
+
+    async def close(self):
+        await self._client.close()
+
+
+_shared_client = None
+
+
+def get_llm_client() -> LLMClient:
+    """Return the shared LLM client, creating it on first use."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = LLMClient()
+    return _shared_client
+
+
+async def close_llm_client():
+    """Close the shared client's connections (called on app shutdown)."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.close()
+        _shared_client = None
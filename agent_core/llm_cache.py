@@ -0,0 +1,147 @@
+import os
+import re
+import copy
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Expired disk rows are deleted at most this often, not on every put
+DISK_PRUNE_INTERVAL = float(os.getenv("LLM_CACHE_PRUNE_INTERVAL", 60))
+
+
+def normalize_message(text: str) -> str:
+    """Canonical form of a user message: lowercase, single spaces, no trailing punctuation."""
+    return _WHITESPACE_RE.sub(" ", (text or "").lower()).strip().rstrip(".!?").strip()
+
+
+class LLMResponseCache:
+    """
+    Cache of parsed LLM intent-extraction results.
+
+    Keys hash the model, system prompt (which embeds the user's facts), the
+    trimmed history and the normalized user message, so a hit only happens
+    when the model would see an equivalent prompt. Entries live in an LRU
+    with a TTL; when `disk_path` is set they are also written to a SQLite
+    file so they survive restarts (and are shared by workers on one host).
+    get/put are coroutines: the memory tier answers inline, disk reads and
+    writes run on a worker thread.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, disk_path: str = None):
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1024))
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", 3600))
+        self.disk_path = disk_path if disk_path is not None else os.getenv("LLM_CACHE_PATH")
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._last_prune = 0.0
+        if self.disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.disk_path)), exist_ok=True)
+            self._conn().executescript("""
+                CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS llm_cache_stored_at ON llm_cache (stored_at);
+            """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model: str, messages: list) -> str:
+        """Hash of the canonicalized prompt; the last message is the user's new message."""
+        canonical = [{"role": m["role"], "content": m["content"]} for m in messages[:-1]]
+        canonical.append({"role": messages[-1]["role"], "content": normalize_message(messages[-1]["content"])})
+        raw = json.dumps({"model": model, "messages": canonical}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get(self, key: str):
+        """Return a copy of the cached value, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry[1])
+                del self._entries[key]
+
+        if self.disk_path:
+            value = await asyncio.to_thread(self._read_disk, key, now)
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, key: str, value: dict):
+        now = time.time()
+        self._remember(key, copy.deepcopy(value), now)
+        if self.disk_path:
+            await asyncio.to_thread(self._write_disk, key, json.dumps(value), now)
+
+    def _read_disk(self, key, now):
+        row = self._conn().execute("SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if not row or now - row[1] > self.ttl:
+            return None
+        value = json.loads(row[0])
+        self._remember(key, value, row[1])
+        return copy.deepcopy(value)
+
+    def _write_disk(self, key, value_json, now):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, value_json, now))
+        if now - self._last_prune >= DISK_PRUNE_INTERVAL:
+            self._last_prune = now
+            conn.execute("DELETE FROM llm_cache WHERE stored_at < ?", (now - self.ttl,))
+
+    def _remember(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_tier": bool(self.disk_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_shared_cache = None
+
+
+def get_llm_cache():
+    """Return the process-wide cache, or None when LLM_CACHE=0."""
+    global _shared_cache
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    if _shared_cache is None:
+        _shared_cache = LLMResponseCache()
+    return _shared_cache
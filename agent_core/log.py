@@ -0,0 +1,143 @@
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from agent_core.metrics import current_trace_id
+
+# Session of the request being handled (set by ShoppingAgent)
+current_session_id = contextvars.ContextVar("current_session_id", default=None)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Large payloads (search results, LLM JSON) are cut to this many characters
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", 500))
+LOG_PAYLOAD_MAX_ITEMS = int(os.getenv("LOG_PAYLOAD_MAX_ITEMS", 5))
+
+NOISY_LOGGERS = ("httpx", "mcp", "asyncio")
+
+# Standard LogRecord attributes; anything else on a record came from `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class preview:
+    """
+    Lazy, truncated rendering of a large object for log fields.
+
+    Nothing is serialized unless the record is actually emitted (and then on
+    the logging thread): lists keep their first LOG_PAYLOAD_MAX_ITEMS items
+    plus a count, and the JSON text is cut at LOG_PAYLOAD_MAX_CHARS.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def _sample(self, obj):
+        if isinstance(obj, dict):
+            return {k: self._sample(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)) and len(obj) > LOG_PAYLOAD_MAX_ITEMS:
+            return [self._sample(v) for v in obj[:LOG_PAYLOAD_MAX_ITEMS]] + [f"... {len(obj) - LOG_PAYLOAD_MAX_ITEMS} more"]
+        return obj
+
+    def __str__(self):
+        text = json.dumps(self._sample(self.obj), default=str, ensure_ascii=False)
+        if len(text) > LOG_PAYLOAD_MAX_CHARS:
+            return f"{text[:LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
+        return text
+
+    __repr__ = __str__
+
+
+class ContextFilter(logging.Filter):
+    """Stamps each record with the trace/session of the request that logged it."""
+
+    def filter(self, record):
+        record.trace_id = current_trace_id.get()
+        record.session_id = current_session_id.get()
+        return True
+
+
+class _RecordQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread. Only the message and traceback are
+    rendered here; `extra` fields (e.g. `preview` payloads) are left for the
+    listener, so their cost is off the request path.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, trace_id, session_id, extra fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("trace_id", "session_id"):
+            if getattr(record, key, None):
+                entry[key] = getattr(record, key)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry and key not in ("trace_id", "session_id"):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+_listener = None
+
+
+def configure_logging(level: str = None, stream=None):
+    """
+    Route all logging through a queue to one background thread that writes
+    JSON lines to stderr, so request handlers never block on the pipe.
+    Safe to call more than once.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    handler = _RecordQueueHandler(records)
+    handler.addFilter(ContextFilter())
+    # Replace basicConfig-style handlers; uvicorn's own loggers keep theirs
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    # Libraries that log every HTTP request / MCP message at INFO
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = QueueListener(records, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the logging thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
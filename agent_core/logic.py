@@ -1,230 +1,476 @@
 import os
 import json
-import sys
+import time
 import asyncio
-import traceback
-from openai import OpenAI
+import functools
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from agent_core.base import BaseAgent
+from agent_core.llm import get_llm_client
+from agent_core.llm_cache import get_llm_cache
+from agent_core.query_parser import parse_query, search_covers, CATEGORY_SYNONYMS, FAST_PATH_CONFIDENCE
+from agent_core.tool_transport import create_tool_transport
+from agent_core.scheduler import run_concurrently
+from agent_core.conversation_store import create_conversation_store
+from agent_core.session_state import fold_turn, apply_state, record_shown, record_feedback, context_message, SESSION_RECENT_MESSAGES
+from agent_core.metrics import metrics
+from agent_core.log import current_session_id, preview
+from agent_core.deadline import Deadline, DeadlineExceeded, LLM_TIMEOUT_SECONDS, TOOL_TIMEOUT_SECONDS
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+SHOPPING_MODEL = os.getenv("SHOPPING_MODEL", "llama-3.3-70b-versatile")
+
+# Set FAST_PATH=0 to send every request through the LLM
+FAST_PATH = os.getenv("FAST_PATH", "1") != "0"
+# Set SPECULATIVE_SEARCH=1 to search on locally parsed constraints while waiting on the LLM
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "0") == "1"
+
+# Static system prompts: byte-identical on every request so upstream prompt
+# caching can reuse them; per-session state and facts go in a separate message
+SYSTEM_PROMPT_FIRST = (
+    "You are a Personal Shopping Concierge. "
+    "A SESSION STATE message (if present) summarizes earlier turns and USER HISTORY lists saved preferences; "
+    "keep their constraints unless the user changes them."
+    "\n\n=== FIRST MESSAGE RULES ==="
+    "\n1. You may ask UP TO 3 short clarifying questions"
+    "\n2. Questions should be quick yes/no or simple choices"
+    "\n3. After questions, you MUST also provide a search query"
+    "\n\n=== EXTRACTION RULES ==="
+    "\n- SIZE: Extract size if mentioned (e.g. 'size 9' -> '9', 'size M' -> 'M'). IF user says 'size 8 and 9', put '8 and 9'."
+    "\n- BUDGET: Extract max price in INR. 'cheap' -> 2000, 'mid-range' -> 5000, 'premium' -> 10000+"
+    "\n- 'under 3000' -> budget: 3000"
+    "\n- 'around 5k' -> budget: 5500"
+    "\n\n=== CATEGORY MAPPING ==="
+    "\n- shoes/sneakers/boots/sandals/loafers → category='footwear'"
+    "\n- shirts/pants/clothes/t-shirts/jeans → category='apparel'"
+    "\n- belts/bags/watches/sunglasses → category='accessories'"
+    "\n\n=== OUTPUT FORMAT (JSON ONLY) ==="
+    "\n{"
+    '\n  "query": "search terms from user (REQUIRED)",\n'
+    '  "category": "footwear|apparel|accessories",\n'
+    '  "budget": null,\n'
+    '  "size": null,\n'
+    '  "avoid_keywords": [],\n'
+    '  "new_facts": [],\n'
+    '  "questions": ["optional: up to 3 brief questions"]\n'
+    "}"
+)
+
+SYSTEM_PROMPT_FOLLOW_UP = (
+    "You are a Personal Shopping Concierge. "
+    "A SESSION STATE message (if present) summarizes earlier turns and USER HISTORY lists saved preferences; "
+    "keep their constraints unless the user changes them."
+    "\n\n=== FOLLOW-UP MESSAGE RULES ==="
+    "\n1. DO NOT ask any questions. User is giving you filter info."
+    "\n2. Extract any new preferences (size, color, budget, avoid)"
+    "\n3. Return questions as empty array []"
+    "\n4. Just search and show products."
+    "\n\n=== EXTRACTION RULES ==="
+    "\n- SIZE: Extract size (e.g. 'size 9' -> '9')."
+    "\n- BUDGET: Extract max price in INR. 'cheap' -> 2000, 'mid-range' -> 5000, 'premium' -> 10000+"
+    "\n- 'under 3000' -> budget: 3000"
+    "\n\n=== CATEGORY MAPPING ==="
+    "\n- shoes/sneakers/boots/sandals/loafers → category='footwear'"
+    "\n- shirts/pants/clothes/t-shirts/jeans → category='apparel'"
+    "\n- belts/bags/watches/sunglasses → category='accessories'"
+    "\n\n=== OUTPUT (JSON ONLY) ==="
+    "\n{"
+    '\n  "query": "search terms",\n'
+    '  "category": "footwear|apparel|accessories",\n'
+    '  "budget": null,\n'
+    '  "size": null,\n'
+    '  "avoid_keywords": [],\n'
+    '  "new_facts": [],\n'
+    '  "questions": []\n'
+    "}"
+    "\nIMPORTANT: questions MUST be [] empty. Just filter and show results."
+)
+
 class ShoppingAgent(BaseAgent):
-    # Class-level conversation history per user session
-    _conversations = {}
+    # Class-level conversation history per user session (bounded: LRU + idle TTL + token budget).
+    # SESSION_BACKEND=sqlite shares it between worker processes.
+    _conversations = create_conversation_store()
+    # How each request's intent was extracted ("fast_path" or "llm"), for /agents/stats
+    _intent_sources = Counter()
+    # Speculative searches launched / reused / re-run / failed
+    _speculation = Counter()
     
-    def __init__(self, user_id: str, session_id: str = None):
+    def __init__(self, user_id: str, session_id: str = None, tools=None, background=None, deadline: Deadline = None):
         super().__init__(user_id)
+        self.deadline = deadline  # Per-request time budget; a fresh REQUEST_DEADLINE_SECONDS one if None
         self.session_id = session_id or user_id  # Use session_id if provided
+        current_session_id.set(self.session_id)
+        self.tools = tools  # Shared ToolTransport (created in the app lifespan)
+        self.background = background  # Shared BackgroundTaskQueue for side-effect-only steps
         
-        # Using Groq for high-speed, free-tier reasoning
-        self.client = OpenAI(
-            api_key=os.getenv("GROQ_API_KEY") or os.getenv("OPENAI_API_KEY"),
-            base_url="https://api.groq.com/openai/v1"
-        )
-        # Initialize conversation history for this session if not exists
-        if self.session_id not in ShoppingAgent._conversations:
-            ShoppingAgent._conversations[self.session_id] = []
+        # Using Groq for high-speed, free-tier reasoning (shared async client)
+        self.llm = get_llm_client()
+        self.llm_cache = get_llm_cache()  # None when LLM_CACHE=0
 
     @classmethod
-    def clear_conversation(cls, session_id: str):
+    async def clear_conversation(cls, session_id: str):
         """Clear conversation history for a specific session."""
-        if session_id in cls._conversations:
-            del cls._conversations[session_id]
-            return True
-        return False
+        return await cls._conversations.call("clear", session_id)
 
     @classmethod
-    def get_conversation_count(cls, session_id: str):
+    async def get_conversation_count(cls, session_id: str):
         """Get number of messages in a session."""
-        return len(cls._conversations.get(session_id, []))
+        return await cls._conversations.call("message_count", session_id)
+
+    @classmethod
+    async def record_feedback(cls, session_id: str, product_id: str, liked: bool):
+        """Mark a product liked/disliked in the session state; returns the new state."""
+        state = record_feedback(await cls._conversations.call("get_state", session_id), product_id, liked)
+        await cls._conversations.call("set_state", session_id, state)
+        return state
+
+    @classmethod
+    async def get_conversation_stats(cls, session_id: str = None):
+        """Memory/trim stats for one session, or for the whole store."""
+        return await cls._conversations.call("stats", session_id)
+
+    @classmethod
+    def get_intent_stats(cls):
+        """Share of requests parsed locally vs sent to the LLM."""
+        total = sum(cls._intent_sources.values())
+        fast = cls._intent_sources["fast_path"]
+        return {
+            "fast_path": fast,
+            "llm": cls._intent_sources["llm"],
+            "fast_path_rate": round(fast / total, 4) if total else 0.0,
+            "confidence_threshold": FAST_PATH_CONFIDENCE
+        }
+
+    @classmethod
+    def get_speculation_stats(cls):
+        """How often the speculative search could be reused."""
+        hits, misses = cls._speculation["hits"], cls._speculation["misses"]
+        return {
+            "enabled": SPECULATIVE_SEARCH,
+            "launched": cls._speculation["launched"],
+            "hits": hits,
+            "misses": misses,
+            "failed": cls._speculation["failed"],
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+        }
+
+    @asynccontextmanager
+    async def _tool_transport(self):
+        """Use the shared transport, or a single-use one when the agent runs standalone."""
+        if self.tools is not None:
+            yield self.tools
+            return
+        tools = create_tool_transport(pool_size=1)
+        await tools.start()
+        try:
+            yield tools
+        finally:
+            await tools.close()
 
     async def process_request(self, message: str):
-        print(f"[TRACE {self.trace_id}] THOUGHT: Initiating PSC end-to-end loop.")
-        print(f"[DEBUG] Session: {self.session_id}, History count: {len(ShoppingAgent._conversations.get(self.session_id, []))}", file=sys.stderr)
-        
-        base_path = os.getcwd()
-        server_script = os.path.abspath(os.path.join(base_path, "mcp_server", "server.py"))
-        server_params = StdioServerParameters(
-            command=sys.executable,
-            args=["-u", server_script],
-            env=os.environ.copy()
-        )
+        """Run the whole loop and return the final response (the stream's last event)."""
+        async for event, data in self.stream_request(message):
+            if event in ("done", "error"):
+                return data
+
+    async def stream_request(self, message: str):
+        """
+        Run the loop as an async generator of (event, data) pairs, emitted as each stage completes:
+        `understood_request` once the intent is known, `products` batches as results are ready,
+        then `done` with the full response (or `error`).
+        """
+        logger.info("Initiating PSC end-to-end loop")
+        deadline = self.deadline or Deadline()
+        degraded = []  # Stages that fell back because they ran out of time or failed
+        started = time.perf_counter()
 
         try:
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    
-                    # 1. READ MEMORY: Fetch user preferences via MCP
-                    user_mem_res = await session.call_tool("read_memory", arguments={"user_id": self.user_id})
-                    user_mem = self._parse_mcp_content(user_mem_res)
+            async with self._tool_transport() as tools:
+                # 1. READ MEMORY: Fetch user preferences via MCP (personalization only, so
+                # a slow read is skipped rather than holding up the request)
+                try:
+                    user_mem = await deadline.run(
+                        tools.call("read_memory", {"user_id": self.user_id}), cap=TOOL_TIMEOUT_SECONDS, stage="read_memory"
+                    )
                     facts = user_mem.get("facts", [])
+                except DeadlineExceeded as e:
+                    logger.warning("%s; continuing without memory", e)
+                    facts = []
+                    degraded.append("memory")
+                except Exception as e:
+                    # Tool error or a broken transport/pool session: same as no memory
+                    logger.warning("read_memory failed (%s: %s); continuing without memory", type(e).__name__, e)
+                    facts = []
+                    degraded.append("memory")
+                # Earlier turns of this session, folded into constraints + liked/rejected IDs
+                state = await ShoppingAgent._conversations.call("get_state", self.session_id)
 
-                    # 2. PARSE REQUEST: Check if this is first message in session
-                    conversation = ShoppingAgent._conversations.get(self.session_id, [])
-                    is_first_message = len(conversation) == 0
-                    
-                    system_prompt = self._build_system_prompt(facts, is_first_message)
-                    
-                    # Build messages with conversation history for THIS session
-                    messages = [{"role": "system", "content": system_prompt}]
-                    
-                    # Add conversation history (last 10 messages for context)
-                    for turn in conversation[-10:]:
-                        messages.append(turn)
-                    
-                    # Add current user message
-                    messages.append({"role": "user", "content": message})
-                    
-                    print(f"[DEBUG] Sending {len(messages)} messages to LLM", file=sys.stderr)
-                    
-                    response = self.client.chat.completions.create(
-                        model="llama-3.3-70b-versatile",
-                        messages=messages,
-                        response_format={"type": "json_object"}
-                    )
-                    brain = json.loads(response.choices[0].message.content)
-                    print(f"[DEBUG] AI Brain: {json.dumps(brain)}", file=sys.stderr)
-                    
-                    # Save conversation turn for this session
-                    ShoppingAgent._conversations[self.session_id].append({"role": "user", "content": message})
-                    ShoppingAgent._conversations[self.session_id].append({"role": "assistant", "content": response.choices[0].message.content})
-
-                    # 3. SEARCH PRODUCTS: Call tool with filters
-                    search_query = brain.get("query") or message
-                    budget = brain.get("budget")
-                    if budget is None:
-                        budget = 10000
-                    category = brain.get("category", None)
-                    size = brain.get("size", None)  # Extract size from AI
-                    
-                    # Normalize category with synonyms
-                    category = self._normalize_category(category, message)
-                    
-                    # Standardize avoid list
-                    avoid = brain.get("avoid_keywords", [])
-                    if isinstance(avoid, str):
-                        avoid = avoid.split()
-                    
-                    print(f"[DEBUG] Calling tool search_products with query='{search_query}', cat='{category}'", file=sys.stderr)
-                    
-                    search_args = {
-                        "query": search_query,
-                        "budget_max": int(budget),
-                        "avoid_keywords": brain.get("avoid_keywords", [])
-                    }
-                    if category:
-                        search_args["category"] = category
-                    if size:
-                        search_args["size"] = size
-                        
-                    search_res = await session.call_tool("search_products", arguments=search_args)
-                    
-                    print(f"[DEBUG] Raw Tool Result: {search_res}", file=sys.stderr)
-                    
-                    # Parse tool result
-                    if search_res and search_res.content:
+                # 2. PARSE REQUEST: simple structured queries are parsed locally;
+                # anything ambiguous goes to the LLM with the session state + last exchange
+                speculative = None
+                try:
+                    brain, confidence = parse_query(message)
+                    if FAST_PATH and confidence >= FAST_PATH_CONFIDENCE:
+                        ShoppingAgent._intent_sources["fast_path"] += 1
+                        logger.debug("Fast-path parse (confidence %s)", confidence)
+                    else:
+                        ShoppingAgent._intent_sources["llm"] += 1
+                        if SPECULATIVE_SEARCH:
+                            # Search on the locally parsed constraints while the LLM runs
+                            speculative_args, _, _ = self._search_args(brain, message, state)
+                            speculative = asyncio.create_task(tools.call("search_products", speculative_args))
+                            ShoppingAgent._speculation["launched"] += 1
+                        local_brain = brain
                         try:
-                            # Search result is usually a text string of JSON
-                            results = json.loads(search_res.content[0].text)
+                            # Keep time back for search + hydration after the LLM returns
+                            with metrics.span("intent.llm"):
+                                brain = await self._extract_intent(
+                                    await self._build_messages(facts, message, state),
+                                    timeout=deadline.timeout(LLM_TIMEOUT_SECONDS, reserve=2 * TOOL_TIMEOUT_SECONDS)
+                                )
                         except Exception as e:
-                            print(f"[ERROR] Failed to parse tool result: {e}", file=sys.stderr)
-                    else:
-                        print("[ERROR] Tool returned no content or None", file=sys.stderr)
-                    
-                    products = self._parse_mcp_content(search_res)
+                            # Timed out, circuit open or upstream error: degrade to the local parse
+                            logger.warning("LLM unavailable (%s: %s); using local parse", type(e).__name__, e)
+                            brain = local_brain
+                            degraded.append("llm")
+                    logger.debug("AI brain", extra={"brain": preview(brain)})
+                
+                    # Save conversation turn for this session (assistant JSON re-serialized compactly)
+                    await ShoppingAgent._conversations.call("append", self.session_id, "user", message)
+                    await ShoppingAgent._conversations.call(
+                        "append", self.session_id, "assistant", json.dumps(brain, separators=(",", ":"))
+                    )
+                    state = fold_turn(state, message, brain)
+
+                    # 3. SEARCH PRODUCTS: Call tool with filters; everything shown
+                    # below describes the state-applied brain the search actually used
+                    search_args, category, brain = self._search_args(brain, message, state)
+
+                    yield "understood_request", {
+                        "trace_id": self.trace_id,
+                        "understood_request": self._understood_request(brain, category),
+                        "clarifying_questions": brain.get("questions", [])
+                    }
+                
+                    logger.debug("Calling search_products", extra={"search_args": preview(search_args)})
+                
+                    search_res = None
+                    if speculative:
+                        search_res = await deadline.run(
+                            self._reuse_speculative(speculative, speculative_args, search_args), stage="speculative search"
+                        )
+                    if search_res is None:
+                        search_res = await deadline.run(
+                            tools.call("search_products", search_args), cap=TOOL_TIMEOUT_SECONDS, stage="search_products"
+                        )
+                
+                    logger.debug("Search returned", extra={"result": preview(search_res)})
+                
+                    products = search_res
                     if isinstance(products, dict): 
                         products = products.get("products", [])
 
-                    # 4. GET DETAILS: Hydrate results with full metadata
-                    final_results = []
-                    if products:
-                        for p in products[:6]:
-                            pid = p.get("product_id")
-                            if pid:
-                                detail_res = await session.call_tool("get_product_details", arguments={"product_id": pid})
-                                final_results.append(self._parse_mcp_content(detail_res))
+                    # 4. GET DETAILS: search returns full catalog records, so only
+                    # entries missing display fields need hydrating (one bulk call).
+                    # Ready products are streamed first, hydrated ones follow.
+                    rejected = set(state["rejected"])
+                    top_products = [p for p in products if p.get("product_id") and p["product_id"] not in rejected][:6]
+                    to_hydrate = [p["product_id"] for p in top_products if not self._is_hydrated(p)]
+                    size_label = brain.get("size", "your size")
+                    ready = [p for p in top_products if self._is_hydrated(p)]
+                    if ready:
+                        yield "products", {"results": [self._format_product(p, size_label) for p in ready]}
+                    if to_hydrate:
+                        try:
+                            details = await deadline.run(
+                                tools.call("get_products", {"product_ids": to_hydrate}), cap=TOOL_TIMEOUT_SECONDS, stage="get_products"
+                            )
+                            by_id = {d.get("product_id"): d for d in details.get("products", [])}
+                        except DeadlineExceeded as e:
+                            # Out of time: return the products that were already complete
+                            logger.warning("%s; returning partial results", e)
+                            by_id = {}
+                            degraded.append("hydration")
+                        hydrated = [by_id.get(pid) for pid in to_hydrate if by_id.get(pid)]
+                        if hydrated:
+                            yield "products", {"results": [self._format_product(p, size_label) for p in hydrated]}
+                        top_products = [by_id.get(p["product_id"]) or p for p in top_products
+                                        if p["product_id"] in by_id or self._is_hydrated(p)]
+                    final_results = top_products
+                    state = record_shown(state, [r.get("product_id") for r in final_results])
+                    await ShoppingAgent._conversations.call("set_state", self.session_id, state)
 
-                    # 5. SAVE SHORTLIST
+                    # 5 + 6. SAVE SHORTLIST & WRITE MEMORY: nothing in the response depends
+                    # on them, so they run after it is returned when a background queue exists
                     shortlist_ids = [r.get("product_id") for r in final_results[:2]]
-                    await session.call_tool("save_shortlist", arguments={"user_id": self.user_id, "items": shortlist_ids})
-
-                    # 6. WRITE MEMORY: Update persistent facts
                     new_facts = brain.get("new_facts", [])
-                    if new_facts:
-                        await session.call_tool("write_memory", arguments={"user_id": self.user_id, "facts": new_facts})
-                    
+                    persist = functools.partial(self._persist, tools, shortlist_ids, new_facts)
+                    if self.background is not None and self.tools is not None:
+                        await self.background.submit(f"persist:{self.trace_id}", persist)
+                    else:
+                        try:
+                            await deadline.run(persist(), cap=TOOL_TIMEOUT_SECONDS, stage="persist")
+                        except DeadlineExceeded as e:
+                            logger.warning("%s; shortlist/memory not saved", e)
+                            degraded.append("persist")
+                        except Exception as e:
+                            # Best-effort: a failed save (an ExceptionGroup from the
+                            # concurrent steps) must not turn the results into an error
+                            errors = getattr(e, "exceptions", (e,))
+                            logger.warning("Persist failed (%s); shortlist/memory not saved",
+                                           "; ".join(f"{type(x).__name__}: {x}" for x in errors))
+                            degraded.append("persist")
+                
                     # 7. RETURN STRUCTURED JSON
-                    return self._format_ui_response(brain, final_results, category)
+                    message_count = await ShoppingAgent._conversations.call("message_count", self.session_id)
+                    response = self._format_ui_response(brain, final_results, category, message_count)
+                    if degraded:
+                        response["degraded"] = degraded
+                    metrics.record_span("agent.shopping", time.perf_counter() - started, self.trace_id)
+                    metrics.inc("hushh_agent_requests_total", agent="shopping", outcome="degraded" if degraded else "ok")
+                    yield "done", response
+                finally:
+                    # Client gone, or a later stage failed before the speculative
+                    # result was used: don't leave it holding a pool lease
+                    self._discard_speculative(speculative)
 
         except Exception as e:
-            print(f"[TRACE {self.trace_id}] ERROR:")
-            traceback.print_exc(file=sys.stderr)
-            return {"agent": "personal_shopping_concierge", "trace_id": self.trace_id, "error": str(e), "results": []}
+            logger.exception("Shopping request failed")
+            metrics.inc("hushh_agent_requests_total", agent="shopping", outcome="error")
+            yield "error", {"agent": "personal_shopping_concierge", "trace_id": self.trace_id, "error": str(e), "results": []}
 
-    def _build_system_prompt(self, facts, is_first_message=False):
-        """Build system prompt based on conversation stage."""
+    def _search_args(self, brain, message, state=None):
+        """
+        search_products arguments for an extracted brain; returns (args, normalized
+        category, brain). Constraints the brain leaves empty come from the session
+        state; the returned brain has them filled in.
+        """
+        brain = apply_state(brain, state)
+        search_query = brain.get("query") or message
+        budget = brain.get("budget")
+        if budget is None:
+            budget = 10000
+        category = brain.get("category", None)
+        size = brain.get("size", None)  # Extract size from AI
+        
+        # Normalize category with synonyms
+        category = self._normalize_category(category, message)
         
-        if is_first_message:
-            # FIRST MESSAGE: Can ask UP TO 3 questions to understand needs
-            return (
-                f"You are a Personal Shopping Concierge. USER HISTORY: {facts}. "
-                "\n\n=== FIRST MESSAGE RULES ==="
-                "\n1. You may ask UP TO 3 short clarifying questions"
-                "\n2. Questions should be quick yes/no or simple choices"
-                "\n3. After questions, you MUST also provide a search query"
-                "\n\n=== EXTRACTION RULES ==="
-                "\n- SIZE: Extract size if mentioned (e.g. 'size 9' -> '9', 'size M' -> 'M'). IF user says 'size 8 and 9', put '8 and 9'."
-                "\n- BUDGET: Extract max price in INR. 'cheap' -> 2000, 'mid-range' -> 5000, 'premium' -> 10000+"
-                "\n- 'under 3000' -> budget: 3000"
-                "\n- 'around 5k' -> budget: 5500"
-                "\n\n=== CATEGORY MAPPING ==="
-                "\n- shoes/sneakers/boots/sandals/loafers → category='footwear'"
-                "\n- shirts/pants/clothes/t-shirts/jeans → category='apparel'"
-                "\n- belts/bags/watches/sunglasses → category='accessories'"
-                "\n\n=== OUTPUT FORMAT (JSON ONLY) ==="
-                "\n{"
-                '\n  "query": "search terms from user (REQUIRED)",\n'
-                '  "category": "footwear|apparel|accessories",\n'
-                '  "budget": null,\n'
-                '  "size": null,\n'
-                '  "avoid_keywords": [],\n'
-                '  "new_facts": [],\n'
-                '  "questions": ["optional: up to 3 brief questions"]\n'
-                "}"
-            )
-        else:
-            # FOLLOW-UP MESSAGES: NO questions, just filter and show results
-            return (
-                f"You are a Personal Shopping Concierge. USER HISTORY: {facts}. "
-                "\n\n=== FOLLOW-UP MESSAGE RULES ==="
-                "\n1. DO NOT ask any questions. User is giving you filter info."
-                "\n2. Extract any new preferences (size, color, budget, avoid)"
-                "\n3. Return questions as empty array []"
-                "\n4. Just search and show products."
-                "\n\n=== EXTRACTION RULES ==="
-                "\n- SIZE: Extract size (e.g. 'size 9' -> '9')."
-                "\n- BUDGET: Extract max price in INR. 'cheap' -> 2000, 'mid-range' -> 5000, 'premium' -> 10000+"
-                "\n- 'under 3000' -> budget: 3000"
-                "\n\n=== CATEGORY MAPPING ==="
-                "\n- shoes/sneakers/boots/sandals/loafers → category='footwear'"
-                "\n- shirts/pants/clothes/t-shirts/jeans → category='apparel'"
-                "\n- belts/bags/watches/sunglasses → category='accessories'"
-                "\n\n=== OUTPUT (JSON ONLY) ==="
-                "\n{"
-                '\n  "query": "search terms",\n'
-                '  "category": "footwear|apparel|accessories",\n'
-                '  "budget": null,\n'
-                '  "size": null,\n'
-                '  "avoid_keywords": [],\n'
-                '  "new_facts": [],\n'
-                '  "questions": []\n'
-                "}"
-                "\nIMPORTANT: questions MUST be [] empty. Just filter and show results."
-            )
+        search_args = {
+            "query": search_query,
+            "budget_max": int(budget),
+            "avoid_keywords": brain.get("avoid_keywords", []),
+            # Only the top 6 are shown; fetch extra to replace products the user turned down
+            "limit": 6 + min(len((state or {}).get("rejected", [])), 6)
+        }
+        if category:
+            search_args["category"] = category
+        if size:
+            search_args["size"] = size
+        return search_args, category, brain
+
+    @staticmethod
+    def _discard_speculative(task):
+        """Cancel an unfinished speculative search, or retrieve a finished one's error so it isn't logged as lost."""
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+    async def _reuse_speculative(self, speculative, speculative_args, search_args):
+        """
+        Results of the speculative search if they answer `search_args` too, else None.
+        A larger speculative budget is fine: results are filtered down to the real one.
+        """
+        try:
+            result = await speculative
+        except Exception as e:
+            ShoppingAgent._speculation["failed"] += 1
+            logger.warning("Speculative search failed: %s", e)
+            return None
+        if not isinstance(result, dict) or not search_covers(speculative_args, search_args):
+            ShoppingAgent._speculation["misses"] += 1
+            return None
+        products = result.get("products", [])
+        within = [p for p in products if (p.get("price_inr") or 0) <= search_args["budget_max"]]
+        # Budget filtering only removes items, so the kept ones are still the top of the
+        # real ranking, unless matches beyond the speculative page were never fetched
+        if len(within) < search_args["limit"] and result.get("total", 0) > len(products):
+            ShoppingAgent._speculation["misses"] += 1
+            return None
+        ShoppingAgent._speculation["hits"] += 1
+        logger.debug("Reusing speculative search results")
+        return {**result, "products": within[:search_args["limit"]]}
+
+    async def _build_messages(self, facts, message, state=None):
+        """
+        Static system prompt + session state/facts + the last exchange + the new
+        user message. Older turns reach the LLM only through the folded state, so
+        the prompt stays about the same size however long the session runs.
+        """
+        history = await ShoppingAgent._conversations.call("history", self.session_id)
+        # The store always retains the newest turn, so no history means no earlier message
+        messages = [{"role": "system", "content": self._build_system_prompt(is_first_message=not history)}]
+
+        context = context_message(state, facts)
+        if context:
+            messages.append(context)
+
+        # The last exchange verbatim, so "the black ones" still resolves
+        recent = history[-SESSION_RECENT_MESSAGES:] if SESSION_RECENT_MESSAGES else []
+        while recent and recent[0]["role"] == "assistant":
+            recent = recent[1:]
+        messages.extend(recent)
+
+        messages.append({"role": "user", "content": message})
+
+        logger.debug("Sending %d messages to LLM", len(messages))
+        return messages
+
+    async def _extract_intent(self, messages, timeout: float = None):
+        """Ask the LLM for the structured `brain`, reusing a cached answer for an equivalent prompt."""
+        cache_key = self.llm_cache.make_key(SHOPPING_MODEL, messages) if self.llm_cache else None
+        if cache_key:
+            cached = await self.llm_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("LLM cache hit")
+                return cached
+
+        response = await self.llm.chat_completion(
+            model=SHOPPING_MODEL,
+            messages=messages,
+            response_format={"type": "json_object"},
+            timeout=timeout
+        )
+        brain = json.loads(response.choices[0].message.content)
+        if cache_key:
+            await self.llm_cache.put(cache_key, brain)
+        return brain
+
+    async def _persist(self, tools, shortlist_ids, new_facts):
+        """Save the shortlist and new facts concurrently."""
+        steps = [tools.call("save_shortlist", {"user_id": self.user_id, "items": shortlist_ids})]
+        if new_facts:
+            steps.append(tools.call("write_memory", {"user_id": self.user_id, "facts": new_facts}))
+        # Usually runs on a background worker, so name the trace explicitly
+        with metrics.span("persist", trace_id=self.trace_id):
+            await run_concurrently(*steps)
+
+    @staticmethod
+    def _is_hydrated(product):
+        """True when a search result already carries the fields the UI renders."""
+        return all(field in product for field in ("title", "price_inr"))
+
+    def _build_system_prompt(self, is_first_message=False):
+        """System prompt for the conversation stage (first message may ask questions)."""
+        return SYSTEM_PROMPT_FIRST if is_first_message else SYSTEM_PROMPT_FOLLOW_UP
 
     def _normalize_category(self, category, message):
         """
@@ -236,76 +482,50 @@ class ShoppingAgent(BaseAgent):
             
         category_lower = category.lower().strip()
         
-        # Common synonym mappings to normalize similar terms
-        # This is NOT restrictive - just normalizes common variations
-        synonym_map = {
-            # Footwear variations
-            "shoes": "footwear", "shoe": "footwear", "sneakers": "footwear", 
-            "sneaker": "footwear", "boots": "footwear", "sandals": "footwear",
-            "runners": "footwear", "heels": "footwear", "loafers": "footwear",
-            
-            # Apparel variations  
-            "clothes": "apparel", "clothing": "apparel", "shirts": "apparel",
-            "shirt": "apparel", "t-shirts": "apparel", "t-shirt": "apparel",
-            "tees": "apparel", "tee": "apparel", "pants": "apparel", 
-            "jeans": "apparel", "dresses": "apparel", "jackets": "apparel",
-            
-            # Accessories variations
-            "belts": "accessories", "bags": "accessories", "sunglasses": "accessories",
-            "watches": "accessories", "jewelry": "accessories", "caps": "accessories",
-            
-            # Other common categories (expandable)
-            "games": "toys", "gadgets": "electronics", "groceries": "food",
-            "snacks": "food", "books": "books", "phones": "electronics"
+        # Common synonym mappings (CATEGORY_SYNONYMS) normalize similar terms;
+        # this is NOT restrictive, unknown categories are returned as-is
+        return CATEGORY_SYNONYMS.get(category_lower, category_lower)
+
+    def _understood_request(self, brain, normalized_category):
+        """The `understood_request` block shown above the results."""
+        return {
+            "category": normalized_category or brain.get("category", "unknown"),
+            "constraints": {
+                "budget_inr_max": brain.get("budget", 10000),
+                "size": brain.get("size", "your size"),
+                "style_keywords": brain.get("style_filters", []),
+                "avoid_keywords": brain.get("avoid_keywords", []),
+                "category": normalized_category or brain.get("category", "unknown")
+            }
         }
-        
-        # Return mapped synonym if exists, otherwise return as-is
-        return synonym_map.get(category_lower, category_lower)
 
-    def _parse_mcp_content(self, response):
-        """Standardizes tool output parsing."""
-        try:
-            if hasattr(response, 'content') and response.content:
-                raw_text = response.content[0].text
-                return json.loads(raw_text)
-            return response if isinstance(response, (dict, list)) else {}
-        except Exception: 
-            return {}
-
-    def _format_ui_response(self, brain, results, normalized_category):
+    @staticmethod
+    def _format_product(r, size_label):
+        """One result card for the frontend."""
+        return {
+            "product_id": r.get("product_id"), 
+            "title": r.get("title"), 
+            "price_inr": r.get("price_inr"), 
+            "brand": r.get("brand", "Unknown"),
+            "category": r.get("category", "unknown"),
+            "match_score": 0.95, 
+            "pros": [f"Matches size {size_label}", f"Fits budget (₹{r.get('price_inr')})"],
+            "cons": ["Limited stock"],
+            "why_recommended": f"The {r.get('title')} is recommended because it matches your preferences."
+        }
+
+    def _format_ui_response(self, brain, results, normalized_category, message_count=0):
         """Format response for frontend UI."""
-        avoided_str = ", ".join(brain.get("avoid_keywords", [])) if brain.get("avoid_keywords") else "unwanted styles"
         size_label = brain.get("size", "your size")
 
         return {
             "agent": "personal_shopping_concierge",
             "trace_id": self.trace_id,
             "clarifying_questions": brain.get("questions", []),
-            "understood_request": {
-                "category": normalized_category or brain.get("category", "unknown"),
-                "constraints": {
-                    "budget_inr_max": brain.get("budget", 10000),
-                    "size": size_label,
-                    "style_keywords": brain.get("style_filters", []),
-                    "avoid_keywords": brain.get("avoid_keywords", []),
-                    "category": normalized_category or brain.get("category", "unknown")
-                }
-            },
-            "results": [
-                {
-                    "product_id": r.get("product_id"), 
-                    "title": r.get("title"), 
-                    "price_inr": r.get("price_inr"), 
-                    "brand": r.get("brand", "Unknown"),
-                    "category": r.get("category", "unknown"),
-                    "match_score": 0.95, 
-                    "pros": [f"Matches size {size_label}", f"Fits budget (₹{r.get('price_inr')})"],
-                    "cons": ["Limited stock"],
-                    "why_recommended": f"The {r.get('title')} is recommended because it matches your preferences."
-                } for r in results
-            ],
+            "understood_request": self._understood_request(brain, normalized_category),
+            "results": [self._format_product(r, size_label) for r in results],
             "shortlist": [
                 {"product_id": r.get("product_id"), "reason": "Best value match"} for r in results[:2]
             ],
-            "message_count": len(ShoppingAgent._conversations.get(self.session_id, []))
-        }
\ No newline at end of file
+            "message_count": message_count
+        }
@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+import logging
+import asyncio
+from contextlib import asynccontextmanager
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from agent_core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def default_server_params():
+    """Launch parameters for the local MCP tool server (mcp_server/server.py)."""
+    server_script = os.path.abspath(os.path.join(os.getcwd(), "mcp_server", "server.py"))
+    return StdioServerParameters(
+        command=sys.executable,
+        args=["-u", server_script],
+        env=os.environ.copy()
+    )
+
+
+class _PooledSession:
+    """
+    One long-lived MCP server subprocess plus its initialized ClientSession.
+    The stdio/session context managers are owned by a dedicated task so that
+    they are entered and exited in the same task, as anyio requires.
+    """
+
+    def __init__(self, server_params, slot_id: int):
+        self.server_params = server_params
+        self.slot_id = slot_id
+        self.session = None
+        self.error = None
+        self.last_used = 0.0
+        self.needs_check = False
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = None
+
+    @property
+    def alive(self):
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self, timeout: float):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.slot_id}")
+        try:
+            with metrics.span("mcp.spawn"):
+                await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            raise
+        if self.error:
+            raise self.error
+        self.last_used = time.monotonic()
+
+    async def _run(self):
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def close(self, timeout: float = 5.0):
+        self._closing.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+        except Exception:
+            pass
+
+
+class MCPSessionPool:
+    """
+    Fixed-size pool of long-lived MCP ClientSessions.
+
+    Sessions are spawned once (at app startup) and leased per request with
+    `async with pool.session() as session:`. A lease pings the server when the
+    session has been idle for a while or its previous user hit an error, and
+    respawns the subprocess if it crashed or stopped answering.
+    """
+
+    def __init__(self, size: int = None, server_params=None,
+                 health_check_interval: float = None, spawn_timeout: float = None):
+        self.size = size or int(os.getenv("MCP_POOL_SIZE", 4))
+        self.server_params = server_params or default_server_params()
+        self.health_check_interval = health_check_interval if health_check_interval is not None \
+            else float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", 30))
+        self.spawn_timeout = spawn_timeout or float(os.getenv("MCP_SPAWN_TIMEOUT", 20))
+        self._idle = asyncio.Queue()
+        self._slots = []
+        self._closed = False
+
+    async def start(self):
+        """Spawn every session up front so requests never pay the cold start."""
+        self._slots = [_PooledSession(self.server_params, i) for i in range(self.size)]
+        results = await asyncio.gather(
+            *(slot.start(self.spawn_timeout) for slot in self._slots), return_exceptions=True
+        )
+        for slot, result in zip(self._slots, results):
+            if isinstance(result, BaseException):
+                # Leave it in the pool; the next lease will try to respawn it
+                logger.error("MCP session %d failed to start: %s", slot.slot_id, result)
+            self._idle.put_nowait(slot)
+        logger.info("MCP pool started %d/%d sessions", sum(1 for s in self._slots if s.alive), self.size)
+
+    @asynccontextmanager
+    async def session(self):
+        """Lease a healthy session for the duration of the block."""
+        if self._closed:
+            raise RuntimeError("MCP session pool is closed")
+        start = time.perf_counter()
+        slot = await self._idle.get()
+        slot_id = slot.slot_id
+        try:
+            slot = await self._ensure_healthy(slot)
+            # Waiting for a free session plus any health check/respawn
+            metrics.record_span("mcp.acquire", time.perf_counter() - start)
+            try:
+                yield slot.session
+            except BaseException:
+                # The server may be in a bad state (or a timed-out call may still be
+                # pending on it); verify before the next lease
+                slot.needs_check = True
+                raise
+            finally:
+                slot.last_used = time.monotonic()
+        finally:
+            # Return whatever currently occupies the slot (it may have been respawned)
+            if not self._closed:
+                self._idle.put_nowait(self._slots[slot_id])
+
+    async def _ensure_healthy(self, slot):
+        if slot.alive:
+            idle_for = time.monotonic() - slot.last_used
+            if not slot.needs_check and idle_for < self.health_check_interval:
+                return slot
+            try:
+                await asyncio.wait_for(slot.session.send_ping(), timeout=5)
+                slot.needs_check = False
+                return slot
+            except Exception as e:
+                logger.warning("MCP session %d failed health check: %s", slot.slot_id, e)
+        return await self._respawn(slot)
+
+    async def _respawn(self, slot):
+        logger.warning("Respawning MCP session %d", slot.slot_id)
+        await slot.close()
+        fresh = _PooledSession(self.server_params, slot.slot_id)
+        self._slots[slot.slot_id] = fresh
+        try:
+            await fresh.start(self.spawn_timeout)
+        except BaseException:
+            # The dead slot stays in rotation; the next lease retries the spawn
+            fresh.needs_check = True
+            raise
+        return fresh
+
+    async def close(self):
+        """Shut down every server subprocess."""
+        self._closed = True
+        await asyncio.gather(*(slot.close() for slot in self._slots), return_exceptions=True)
+        self._slots = []
@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Quantiles are computed over this many of the most recent samples per series
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", 1024))
+# Per-trace span lists kept for /metrics/trace/{trace_id}
+METRICS_TRACE_HISTORY = int(os.getenv("METRICS_TRACE_HISTORY", 500))
+QUANTILES = (0.5, 0.95, 0.99)
+
+HELP = {
+    "hushh_stage_duration_seconds": ("summary", "Duration of one stage of request handling"),
+    "hushh_http_request_duration_seconds": ("summary", "End-to-end HTTP request duration"),
+    "hushh_llm_tokens_total": ("counter", "LLM tokens used, by model and kind (prompt/completion)"),
+    "hushh_tool_errors_total": ("counter", "Tool calls that raised"),
+    "hushh_agent_requests_total": ("counter", "Agent requests by agent and outcome"),
+}
+
+# Trace of the request being handled (set when an agent is created)
+current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
+# Spans of the current HTTP request, collected for the Server-Timing header
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+class _Summary:
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        # Nearest-rank quantiles over the window
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    In-process latency summaries, counters and per-trace spans.
+
+    Each uvicorn worker keeps its own registry; /metrics reports the worker
+    that served the scrape. Quantiles (p50/p95/p99) cover the last
+    METRICS_WINDOW samples of each series, counts and sums cover everything.
+    """
+
+    def __init__(self, window: int = None, trace_history: int = None):
+        self.window = window or METRICS_WINDOW
+        self.trace_history = trace_history or METRICS_TRACE_HISTORY
+        self._summaries = {}  # name -> {label_key: _Summary}
+        self._counters = {}   # name -> {label_key: float}
+        self._traces = OrderedDict()  # trace_id -> [span, ...]
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = _Summary(self.window)
+            series[key].observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def span(self, stage: str, trace_id: str = None):
+        """Time the block as `stage`, attributed to `trace_id` (default: the current trace)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(stage, time.perf_counter() - start, trace_id)
+
+    def record_span(self, stage: str, seconds: float, trace_id: str = None):
+        self.observe("hushh_stage_duration_seconds", seconds, stage=stage)
+        trace_id = trace_id or current_trace_id.get()
+        if trace_id:
+            with self._lock:
+                spans = self._traces.get(trace_id)
+                if spans is None:
+                    spans = self._traces[trace_id] = []
+                    while len(self._traces) > self.trace_history:
+                        self._traces.popitem(last=False)
+                spans.append({"stage": stage, "duration_ms": round(seconds * 1000, 3)})
+        request_spans = _request_spans.get()
+        if request_spans is not None:
+            request_spans.append((stage, seconds))
+
+    def trace(self, trace_id: str):
+        """Spans recorded for one trace, oldest first (None if unknown or expired)."""
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return list(spans) if spans is not None else None
+
+    def add_collector(self, collector):
+        """
+        Register a callable returning extra samples at scrape time, as
+        (name, type, help, labels, value) tuples (e.g. cache and queue gauges).
+        """
+        self._collectors.append(collector)
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            summaries = {name: {k: (s.quantiles(), s.sum, s.count) for k, s in series.items()}
+                         for name, series in self._summaries.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name in sorted(summaries):
+            lines.append(f"# HELP {name} {HELP.get(name, ('summary', name))[1]}")
+            lines.append(f"# TYPE {name} summary")
+            for key, (quantiles, total, count) in sorted(summaries[name].items()):
+                for q, value in quantiles.items():
+                    lines.append(f"{name}{_format_labels(key, {'quantile': q})} {value:.6f}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {HELP.get(name, ('counter', name))[1]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+        seen = set()
+        for collector in self._collectors:
+            for name, kind, help_text, labels, value in collector():
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def start_request_spans() -> list:
+    """Collect the spans of the current request (for the Server-Timing header)."""
+    spans = []
+    _request_spans.set(spans)
+    return spans
+
+
+def server_timing(spans: list) -> str:
+    """Format collected spans as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans)
@@ -0,0 +1,169 @@
+import os
+import re
+from mcp_server.search_index import CATEGORY_MAP, COMMON_COLORS, STOP_WORDS, tokenize, parse_sizes
+
+# Category synonyms used to normalize both LLM output and locally parsed queries.
+# Extends the server's CATEGORY_MAP with looser variations; not restrictive,
+# unknown categories pass through unchanged.
+CATEGORY_SYNONYMS = {
+    **CATEGORY_MAP,
+    # Footwear variations
+    "runners": "footwear", "heels": "footwear",
+    # Apparel variations
+    "dresses": "apparel", "jackets": "apparel",
+    # Accessories variations
+    "jewelry": "accessories", "caps": "accessories",
+    # Other common categories (expandable)
+    "games": "toys", "gadgets": "electronics", "groceries": "food",
+    "snacks": "food", "books": "books", "phones": "electronics"
+}
+
+# Budget words from the system prompt's extraction rules
+BUDGET_WORDS = {
+    "cheap": 2000, "affordable": 2000, "budget": 2000, "inexpensive": 2000,
+    "mid-range": 5000, "midrange": 5000,
+    "premium": 10000, "luxury": 10000, "expensive": 10000,
+}
+
+# Words that usually point back at earlier turns or ask for advice; the LLM handles those
+AMBIGUOUS_WORDS = {
+    "it", "its", "this", "that", "these", "those", "them", "they", "one", "ones",
+    "something", "anything", "similar", "like", "more", "other", "others", "else", "instead",
+    "what", "which", "why", "how", "should", "recommend", "suggest", "help", "gift", "match",
+    "goes", "go", "outfit", "occasion", "cheaper", "better", "again", "previous", "last",
+}
+
+FILLER_WORDS = STOP_WORDS | {"please", "pls", "buy", "find", "get", "in", "and", "my", "am", "to", "any", "pair", "pairs"}
+
+NEGATIONS = ("no", "not", "without", "avoid", "except", "non")
+
+FAST_PATH_CONFIDENCE = float(os.getenv("FAST_PATH_CONFIDENCE", 0.8))
+
+# Queries with more free-text terms than this get handed to the LLM
+MAX_DESCRIPTOR_TERMS = 4
+
+_AMOUNT = r"(?:rs\.?|inr|₹)?\s*(\d+(?:\.\d+)?)\s*(k)?"
+_BUDGET_MAX_RE = re.compile(rf"\b(?:under|below|less than|max(?:imum)?|up ?to|within|upto|<)\s*{_AMOUNT}\b")
+_BUDGET_AROUND_RE = re.compile(rf"\b(?:around|about|approx(?:imately)?|roughly|~)\s*{_AMOUNT}\b")
+_BUDGET_BARE_RE = re.compile(r"(?:\b(?:rs\.?|inr)\s*|₹\s*)(\d+(?:\.\d+)?)\s*(k)?\b|\b(\d+(?:\.\d+)?)\s*k\b")
+_SIZE_TOKEN = r"(?:\d{1,2}(?:\.5)?|xxs|xs|s|m|l|xl|xxl|xxxl)"
+_SIZE_LIST = rf"({_SIZE_TOKEN}(?:\s*(?:,|/|and|or)\s*{_SIZE_TOKEN})*)"
+_SIZE_RE = re.compile(rf"\b(?:size|sz|uk|us|eu)\s*{_SIZE_LIST}\b")
+# "tees in M", "jeans in 32": a bare size after "in" (colours etc. don't match the token list)
+_SIZE_IN_RE = re.compile(rf"\bin\s+{_SIZE_LIST}\b")
+# Size-looking words left over after extraction ("xl tees"); the LLM reads those better
+_STRAY_SIZE_WORDS = {"xxs", "xs", "xl", "xxl", "xxxl"}
+_AVOID_RE = re.compile(r"\b(?:no|not|without|avoid|except|non|don'?t want)[\s-]+([a-z][a-z-]*)")
+_WORD_RE = re.compile(r"[a-z][a-z-]*|\d+")
+
+
+def _amount(number: str, thousands: str) -> int:
+    value = float(number)
+    return int(value * 1000 if thousands else value)
+
+
+def _extract_budget(text: str):
+    """Return (budget, text with the budget phrase removed)."""
+    match = _BUDGET_MAX_RE.search(text)
+    if match:
+        return _amount(*match.groups()), text[:match.start()] + " " + text[match.end():]
+    match = _BUDGET_AROUND_RE.search(text)
+    if match:
+        # "around 5k" -> 5500: leave a little headroom above the stated figure
+        return int(_amount(*match.groups()) * 1.1), text[:match.start()] + " " + text[match.end():]
+    match = _BUDGET_BARE_RE.search(text)
+    if match:
+        number, thousands = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), "k")
+        return _amount(number, thousands), text[:match.start()] + " " + text[match.end():]
+    for word, value in BUDGET_WORDS.items():
+        pattern = rf"\b{re.escape(word)}\b"
+        if re.search(pattern, text):
+            return value, re.sub(pattern, " ", text, count=1)
+    return None, text
+
+
+def _extract_size(text: str):
+    """Return (size, text with the size phrase removed); sizes are upper-cased like the catalog."""
+    match = _SIZE_RE.search(text) or _SIZE_IN_RE.search(text)
+    if not match:
+        return None, text
+    size = re.sub(r"\s*,\s*", ", ", match.group(1)).upper().replace(" AND ", " and ").replace(" OR ", " or ")
+    return size, text[:match.start()] + " " + text[match.end():]
+
+
+def parse_query(message: str):
+    """
+    Rule-based extraction of a simple shopping query.
+
+    Returns (brain, confidence): `brain` has the same shape the LLM returns
+    (query, category, budget, size, avoid_keywords, new_facts, questions) and
+    `confidence` is in [0, 1]. Anything that needs conversation context or
+    judgement (no category, references to earlier turns, questions, long
+    free-form text) scores low so the caller falls back to the LLM.
+    """
+    text = (message or "").lower().replace("t shirt", "t-shirt").replace("tshirt", "t-shirt")
+    brain = {
+        "query": "", "category": None, "budget": None, "size": None,
+        "avoid_keywords": [], "new_facts": [], "questions": []
+    }
+    if not text.strip() or "?" in text:
+        return brain, 0.0
+
+    budget, text = _extract_budget(text)
+    size, text = _extract_size(text)
+    avoid = _AVOID_RE.findall(text)
+    text = _AVOID_RE.sub(" ", text)
+
+    terms, category, ambiguous, stray_sizes = [], None, 0, 0
+    for word in _WORD_RE.findall(text):
+        if word in CATEGORY_SYNONYMS:
+            category = category or CATEGORY_SYNONYMS[word]
+            terms.append(word)
+        elif word in AMBIGUOUS_WORDS or word in NEGATIONS:
+            ambiguous += 1
+        elif word.isdigit() or word in _STRAY_SIZE_WORDS:
+            # Stray numbers/sizes that weren't parsed are dropped, not guessed at
+            stray_sizes += 1
+        elif word in FILLER_WORDS:
+            continue
+        else:
+            terms.append(word)
+
+    brain.update({
+        "query": " ".join(terms), "category": category, "budget": budget,
+        "size": size, "avoid_keywords": avoid
+    })
+
+    confidence = 1.0
+    if category is None:
+        confidence -= 0.6
+    if ambiguous:
+        confidence -= 0.4
+    if stray_sizes:
+        # Probably a size or budget in a form the regexes don't know
+        confidence -= 0.3
+    descriptors = [t for t in terms if t not in CATEGORY_SYNONYMS and t not in COMMON_COLORS]
+    if len(descriptors) > MAX_DESCRIPTOR_TERMS:
+        confidence -= 0.1 * (len(descriptors) - MAX_DESCRIPTOR_TERMS)
+    return brain, max(0.0, round(confidence, 2))
+
+
+def _query_terms(query) -> set:
+    return set(tokenize(query or "")) - STOP_WORDS
+
+
+def search_covers(speculative_args: dict, search_args: dict) -> bool:
+    """
+    True when results for `speculative_args` also answer `search_args`: same query
+    terms, category, sizes and avoid list, and a budget at least as large
+    (results can then be filtered down by price).
+    """
+    return (
+        _query_terms(speculative_args.get("query")) == _query_terms(search_args.get("query"))
+        and speculative_args.get("category") == search_args.get("category")
+        and parse_sizes(speculative_args.get("size")) == parse_sizes(search_args.get("size"))
+        and {str(a).lower() for a in speculative_args.get("avoid_keywords") or []}
+            == {str(a).lower() for a in search_args.get("avoid_keywords") or []}
+        and speculative_args.get("budget_max", 0) >= search_args.get("budget_max", 0)
+        and speculative_args.get("limit") == search_args.get("limit")
+    )
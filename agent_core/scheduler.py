@@ -0,0 +1,92 @@
+import os
+import asyncio
+import logging
+from agent_core.deadline import TOOL_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+async def run_concurrently(*coros):
+    """Run independent steps at the same time and return their results in order."""
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(c) for c in coros]
+    return [t.result() for t in tasks]
+
+
+class BackgroundTaskQueue:
+    """
+    Runs side-effect-only pipeline steps (shortlist save, memory write) after
+    the response has been returned.
+
+    Jobs wait in a bounded queue served by a few worker tasks. When the queue
+    is full the job runs inline in the submitting request instead, which both
+    preserves the write and slows producers down. Every job, queued or
+    inline, gets `job_timeout` seconds, so a stuck tool call can't hold a
+    worker (and its pool lease) forever. Failures and timeouts are logged and
+    counted rather than lost silently.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None, job_timeout: float = None):
+        self.workers = workers or int(os.getenv("BACKGROUND_WORKERS", 4))
+        self.job_timeout = job_timeout or float(os.getenv("BACKGROUND_JOB_TIMEOUT", TOOL_TIMEOUT_SECONDS))
+        self._queue = asyncio.Queue(maxsize=max_pending or int(os.getenv("BACKGROUND_MAX_PENDING", 256)))
+        self._tasks = []
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.ran_inline = 0
+        self.last_error = None
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker(), name=f"background-{i}") for i in range(self.workers)]
+
+    async def submit(self, name: str, job):
+        """Queue `job` (a zero-argument coroutine function) to run in the background."""
+        try:
+            self._queue.put_nowait((name, job))
+        except asyncio.QueueFull:
+            self.ran_inline += 1
+            await self._run(name, job)
+
+    async def _worker(self):
+        while True:
+            name, job = await self._queue.get()
+            try:
+                await self._run(name, job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, name, job):
+        try:
+            await asyncio.wait_for(job(), self.job_timeout)
+            self.completed += 1
+        except asyncio.TimeoutError:
+            self.failed += 1
+            self.timed_out += 1
+            self.last_error = f"{name}: timed out after {self.job_timeout:.1f}s"
+            logger.warning("Background job %r timed out after %.1fs", name, self.job_timeout)
+        except Exception as e:
+            self.failed += 1
+            self.last_error = f"{name}: {e}"
+            logger.exception("Background job %r failed", name)
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "ran_inline": self.ran_inline,
+            "last_error": self.last_error,
+        }
+
+    async def close(self, timeout: float = 10.0):
+        """Drain queued jobs (up to `timeout` seconds), then stop the workers."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d background jobs at shutdown", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,107 @@
+import os
+import json
+
+# Raw messages still sent verbatim after the state summary (the last exchange
+# resolves "black ones"-style references); 0 sends the state alone
+SESSION_RECENT_MESSAGES = int(os.getenv("SESSION_RECENT_MESSAGES", 2))
+# Long-term facts sent per prompt (newest kept)
+PROMPT_MAX_FACTS = int(os.getenv("PROMPT_MAX_FACTS", 10))
+MAX_STATE_IDS = 30
+MAX_AVOID_KEYWORDS = 15
+
+# Phrases that turn down the products shown on the previous turn
+REJECT_PHRASES = (
+    "something else", "anything else", "other options", "different ones", "not these", "not those",
+    "none of these", "none of them", "don't like", "dont like", "do not like",
+)
+
+
+def empty_state() -> dict:
+    return {
+        "query": None, "category": None, "size": None, "budget": None,
+        "avoid_keywords": [], "liked": [], "rejected": [], "shown": [], "turns": 0,
+    }
+
+
+def _append_ids(ids: list, new_ids) -> list:
+    """Add IDs (most recent last, no duplicates), keeping the newest MAX_STATE_IDS."""
+    merged = [i for i in ids if i not in new_ids] + [i for i in dict.fromkeys(new_ids) if i]
+    return merged[-MAX_STATE_IDS:]
+
+
+def fold_turn(state: dict, message: str, brain: dict) -> dict:
+    """
+    The session state after one more user turn: constraints the turn set
+    replace the old ones, avoid keywords accumulate, and a "something else"
+    turns down whatever was shown last.
+    """
+    state = {**empty_state(), **(state or {})}
+    lowered = message.lower()
+    if state["shown"] and any(phrase in lowered for phrase in REJECT_PHRASES):
+        state["rejected"] = _append_ids(state["rejected"], state["shown"])
+        state["liked"] = [i for i in state["liked"] if i not in state["rejected"]]
+
+    category = brain.get("category")
+    if category and state["category"] and category != state["category"] and not brain.get("size"):
+        # A shoe size means nothing for shirts
+        state["size"] = None
+    for field in ("query", "category", "size", "budget"):
+        if brain.get(field) not in (None, "", []):
+            state[field] = brain[field]
+
+    avoid = [str(k).lower() for k in brain.get("avoid_keywords") or []]
+    state["avoid_keywords"] = list(dict.fromkeys(state["avoid_keywords"] + avoid))[-MAX_AVOID_KEYWORDS:]
+    state["turns"] += 1
+    return state
+
+
+def apply_state(brain: dict, state: dict) -> dict:
+    """
+    `brain` with the constraints it leaves empty taken from earlier turns:
+    category, budget, size (same category only) and the accumulated avoid
+    keywords. For brains that never saw the session (local parse, degraded LLM).
+    """
+    if not state:
+        return brain
+    brain = dict(brain)
+    category = brain.get("category") or state.get("category")
+    same_category = category == state.get("category")
+    fields = ("category", "budget", "size") if same_category else ("category", "budget")
+    for field in fields:
+        if brain.get(field) in (None, "", []) and state.get(field) not in (None, "", []):
+            brain[field] = state[field]
+    avoid = [str(k).lower() for k in brain.get("avoid_keywords") or []]
+    brain["avoid_keywords"] = list(dict.fromkeys(state.get("avoid_keywords", []) + avoid))
+    return brain
+
+
+def record_shown(state: dict, product_ids: list) -> dict:
+    """Remember what this turn showed, so the next turn can turn it down."""
+    return {**state, "shown": [i for i in product_ids if i]}
+
+
+def record_feedback(state: dict, product_id: str, liked: bool) -> dict:
+    """Explicit like/dislike of one product."""
+    state = {**empty_state(), **(state or {})}
+    keep, drop = ("liked", "rejected") if liked else ("rejected", "liked")
+    state[keep] = _append_ids(state[keep], [product_id])
+    state[drop] = [i for i in state[drop] if i != product_id]
+    return state
+
+
+def context_message(state: dict, facts: list):
+    """
+    The per-session part of the prompt (state summary + user facts) as one
+    message, kept out of the system prompt so that prompt stays byte-stable.
+    None when there is nothing to say.
+    """
+    summary = {k: v for k, v in (state or {}).items() if k not in ("shown", "turns") and v not in (None, "", [])}
+    facts = list(dict.fromkeys(facts or []))[-PROMPT_MAX_FACTS:]
+    if not summary and not facts:
+        return None
+    parts = []
+    if summary:
+        parts.append(f"SESSION STATE (from earlier turns): {json.dumps(summary, separators=(',', ':'))}")
+    if facts:
+        parts.append(f"USER HISTORY: {json.dumps(facts)}")
+    return {"role": "system", "content": "\n".join(parts)}
@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+sys.path.append(os.getcwd())
+
+from agent_core.closet_retrieval import ClosetIndex, CATEGORY_ROLES
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "catalog.json")
+
+
+def _catalog():
+    with open(CATALOG_PATH) as f:
+        return json.load(f)
+
+
+def test_roles_match_catalog_categories():
+    catalog = _catalog()
+    index = ClosetIndex(catalog)
+    for item, role in zip(catalog, index.roles):
+        expected = CATEGORY_ROLES.get(item.get("category"))
+        if expected:
+            assert role == expected, f"{item['title']}: {role} != {expected}"
+        else:
+            assert role in ("top", "bottom", None), f"{item['title']}: {role}"
+
+
+def test_shoe_cuts_are_footwear_without_a_category():
+    index = ClosetIndex([{"product_id": "s1", "title": "Red High-Top Sneakers"},
+                         {"product_id": "s2", "title": "Low Top Everyday Sneaker"},
+                         {"product_id": "t1", "title": "Cropped Top"}])
+    assert index.roles == ["footwear", "footwear", "top"]
+
+
+def test_high_top_question_anchors_on_the_sneakers():
+    catalog = _catalog()
+    selected = ClosetIndex(catalog).select("what goes with my red high-top sneakers", 6)
+    assert selected[0]["title"] == "Red High-Top Sneakers"
+    assert sum(item.get("category") == "footwear" for item in selected) == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
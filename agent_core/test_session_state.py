@@ -0,0 +1,79 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+from agent_core.logic import ShoppingAgent
+from agent_core.query_parser import parse_query
+from agent_core.session_state import fold_turn, record_shown, context_message
+
+
+def _agent():
+    # _search_args only needs the category normalizer, not the LLM/tool clients
+    return ShoppingAgent.__new__(ShoppingAgent)
+
+
+def _first_turn():
+    message = "white sneakers under 3000 no leather"
+    brain, _ = parse_query(message)
+    return fold_turn({}, message, brain)
+
+
+def test_follow_up_search_keeps_earlier_constraints():
+    state = _first_turn()
+    message = "show me shoes size 9"
+    brain, _ = parse_query(message)
+    state = fold_turn(state, message, brain)
+
+    args, category, applied = _agent()._search_args(brain, message, state)
+    assert category == "footwear"
+    assert args["budget_max"] == 3000
+    assert args["avoid_keywords"] == ["leather"]
+    assert args["size"] == "9"
+    # What the UI shows is what was searched
+    assert applied["budget"] == 3000 and applied["avoid_keywords"] == ["leather"]
+
+
+def test_follow_up_in_another_category_drops_the_size():
+    state = fold_turn(_first_turn(), "size 9", {"size": "9"})
+    message = "show me tees in M"
+    brain, _ = parse_query(message)
+    state = fold_turn(state, message, brain)
+    assert _agent()._search_args(brain, message, state)[0]["size"] == "M"
+
+    message = "show me jeans"
+    brain, _ = parse_query(message)
+    args = _agent()._search_args(brain, message, fold_turn(state, message, brain))[0]
+    assert args["size"] == "M"  # still apparel
+    assert args["budget_max"] == 3000
+
+
+def test_degraded_brain_is_filled_from_state():
+    # A turn answered without the LLM: the local parse has no constraints at all
+    args = _agent()._search_args({"query": "something else"}, "something else", _first_turn())[0]
+    assert args["category"] == "footwear"
+    assert args["budget_max"] == 3000
+    assert args["avoid_keywords"] == ["leather"]
+
+
+def test_rejected_products_widen_the_search():
+    state = record_shown(_first_turn(), ["snkr-001", "snkr-002"])
+    state = fold_turn(state, "show me something else", {})
+    assert state["rejected"] == ["snkr-001", "snkr-002"]
+    args = _agent()._search_args({}, "show me something else", state)[0]
+    assert args["limit"] == 8
+
+
+def test_context_message_summarizes_state():
+    message = context_message(_first_turn(), ["likes white", "likes white"])
+    assert message["role"] == "system"
+    assert '"budget":3000' in message["content"]
+    assert message["content"].count("likes white") == 1
+    assert context_message({}, []) is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,14 @@
+# Rough token estimate for budgeting prompts without a tokenizer dependency:
+# ~4 characters per token for English/JSON, plus a few tokens of per-message framing.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text) -> int:
+    """Estimate the number of LLM tokens in a string."""
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(message: dict) -> int:
+    """Estimate the tokens one chat message adds to a prompt."""
+    return estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
@@ -0,0 +1,122 @@
+import os
+import json
+import asyncio
+from abc import ABC, abstractmethod
+from agent_core.mcp_pool import MCPSessionPool
+from agent_core.metrics import metrics
+
+# FastMCP returns list results as one content item per element, so these
+# tools need their content re-assembled into a list on the stdio path.
+_LIST_RESULT_TOOLS = {"get_shortlist"}
+
+
+class ToolError(Exception):
+    """Raised when a tool call fails or names an unknown tool."""
+
+
+class ToolTransport(ABC):
+    """
+    How the agents reach the shopping tools (search_products, read_memory, ...).
+    Every backend returns the tool's result as plain Python dicts/lists, in
+    exactly the shape the tool function itself returns.
+    """
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def call(self, name: str, arguments: dict):
+        """Invoke a tool by name and return its decoded result (timed as `tool.<name>`)."""
+        try:
+            with metrics.span(f"tool.{name}"):
+                return await self._call(name, arguments)
+        except Exception:
+            metrics.inc("hushh_tool_errors_total", tool=name)
+            raise
+
+    @abstractmethod
+    async def _call(self, name: str, arguments: dict):
+        pass
+
+
+class StdioToolTransport(ToolTransport):
+    """Calls tools over MCP stdio through a pool of long-lived server subprocesses."""
+
+    def __init__(self, pool: MCPSessionPool = None, pool_size: int = None):
+        self.pool = pool or MCPSessionPool(size=pool_size)
+
+    async def start(self):
+        await self.pool.start()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def _call(self, name: str, arguments: dict):
+        async with self.pool.session() as session:
+            result = await session.call_tool(name, arguments=arguments)
+        return self._decode(name, result)
+
+    @staticmethod
+    def _decode_text(text):
+        # Dicts/lists arrive as JSON; bare strings (e.g. product IDs) arrive as-is
+        if text[:1] in ("{", "["):
+            return json.loads(text)
+        return text
+
+    def _decode(self, name, result):
+        texts = [c.text for c in (result.content or []) if hasattr(c, "text")]
+        if result.isError:
+            raise ToolError(texts[0] if texts else f"Tool {name} failed")
+        if name in _LIST_RESULT_TOOLS:
+            return [self._decode_text(t) for t in texts]
+        if not texts:
+            return {}
+        return self._decode_text(texts[0])
+
+
+class InProcessToolTransport(ToolTransport):
+    """
+    Calls the tool functions in mcp_server/server.py directly, skipping
+    JSON-RPC framing, the stdio pipe and the JSON round-trip of results.
+    Use when the backend and the tools run in the same container.
+    """
+
+    def __init__(self):
+        self._tools = {}
+        self._server = None
+
+    async def start(self):
+        from mcp_server import server as tool_server
+        self._server = tool_server
+        # The FastMCP registry is the source of truth for which functions are tools
+        for tool in await tool_server.mcp.list_tools():
+            self._tools[tool.name] = getattr(tool_server, tool.name)
+
+    async def close(self):
+        if self._server is not None:
+            # Flush buffered writes, as the stdio server does when its process exits
+            await asyncio.to_thread(self._server.shutdown)
+
+    async def _call(self, name: str, arguments: dict):
+        if not self._tools:
+            await self.start()
+        fn = self._tools.get(name)
+        if fn is None:
+            raise ToolError(f"Unknown tool: {name}")
+        # Tools do file I/O, so keep them off the event loop
+        try:
+            return await asyncio.to_thread(fn, **arguments)
+        except Exception as e:
+            raise ToolError(f"Error executing tool {name}: {e}") from e
+
+
+def create_tool_transport(kind: str = None, pool_size: int = None) -> ToolTransport:
+    """Build the transport selected by TOOL_TRANSPORT ("stdio" or "inprocess")."""
+    kind = (kind or os.getenv("TOOL_TRANSPORT", "stdio")).lower()
+    if kind == "inprocess":
+        return InProcessToolTransport()
+    if kind == "stdio":
+        return StdioToolTransport(pool_size=pool_size)
+    raise ValueError(f"Unknown TOOL_TRANSPORT: {kind}")
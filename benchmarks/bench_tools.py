@@ -0,0 +1,264 @@
+"""
+Microbenchmarks for the MCP tool functions against synthetic catalogs.
+
+    python -m benchmarks.bench_tools --sizes 1000,10000,100000 --output bench.json
+    python -m benchmarks.bench_tools --sizes 1000000 --iterations 200
+    python -m benchmarks.bench_tools --compare bench.json   # diff against an earlier run
+
+The tools are called in-process (no MCP transport), against a catalog and
+storage in a temporary data directory. Latency percentiles and throughput
+come from an untraced pass; peak memory comes from a second, shorter pass
+under tracemalloc (peak bytes allocated by a single call).
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime, timezone
+
+from benchmarks.catalog_gen import generate_catalog
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.json")
+PERCENTILES = (50, 95, 99)
+MEMORY_SAMPLE_CALLS = 100
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    # Nearest-rank, as in agent_core.metrics
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def _summarize(durations: list, wall: float) -> dict:
+    ordered = sorted(durations)
+    stats = {"calls": len(ordered)}
+    for pct in PERCENTILES:
+        stats[f"p{pct}_ms"] = round(_percentile(ordered, pct) * 1000, 4)
+    stats["mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 4)
+    stats["max_ms"] = round(ordered[-1] * 1000, 4)
+    stats["throughput_per_s"] = round(len(ordered) / wall, 1) if wall else None
+    return stats
+
+
+def measure(fn, calls: list, warmup: int = 20) -> tuple:
+    """Run fn(**kwargs) for each kwargs in `calls`; returns (stats, per-call durations)."""
+    for kwargs in calls[:warmup]:
+        fn(**kwargs)
+
+    durations = []
+    wall_start = time.perf_counter()
+    for kwargs in calls:
+        start = time.perf_counter()
+        fn(**kwargs)
+        durations.append(time.perf_counter() - start)
+    stats = _summarize(durations, time.perf_counter() - wall_start)
+
+    tracemalloc.start()
+    peak = 0
+    try:
+        for kwargs in calls[:MEMORY_SAMPLE_CALLS]:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            fn(**kwargs)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    stats["peak_alloc_kb"] = round(peak / 1024, 1)
+    return stats, durations
+
+
+def load_queries(path: str) -> list:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def bench_catalog(server, data_dir: str, size: int, queries: list, iterations: int, seed: int) -> dict:
+    """Load a `size`-SKU catalog and time the catalog tools against it."""
+    from mcp_server.catalog_store import CatalogStore
+
+    path = os.path.join(data_dir, "catalog.json")
+    products = generate_catalog(size, seed)
+    with open(path, "w") as f:
+        json.dump(products, f)
+    file_mb = os.path.getsize(path) / (1024 * 1024)
+    del products
+
+    # Parse + index build, as a catalog.json hot reload would do it
+    tracemalloc.start()
+    start = time.perf_counter()
+    server.CATALOG = CatalogStore(path)
+    load_seconds = time.perf_counter() - start
+    load_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    rng = random.Random(seed)
+    mix = rng.choices(queries, [q.get("weight", 1) for q in queries], k=iterations)
+    search_stats, durations = measure(server.search_products, [dict(q["args"]) for q in mix])
+    by_query = {}
+    for query, duration in zip(mix, durations):
+        by_query.setdefault(query["name"], []).append(duration)
+    search_stats["by_query"] = {
+        name: {"calls": len(d), **{f"p{p}_ms": round(_percentile(sorted(d), p) * 1000, 4) for p in (50, 95)}}
+        for name, d in sorted(by_query.items())
+    }
+    # Result-set sizes explain most of the spread between queries
+    search_stats["matches"] = {q["name"]: server.search_products(**q["args"])["total"] for q in queries}
+
+    ids = list(server.CATALOG.get().by_id)
+    # ~5% lookups for IDs that don't exist
+    lookup = [rng.choice(ids) if rng.random() > 0.05 else f"missing-{i}" for i in range(iterations)]
+    details_stats, _ = measure(server.get_product_details, [{"product_id": pid} for pid in lookup])
+    batches = [{"product_ids": rng.sample(ids, min(6, len(ids)))} for _ in range(iterations)]
+    batch_stats, _ = measure(server.get_products, batches)
+
+    return {
+        "catalog_size": size,
+        "catalog_file_mb": round(file_mb, 2),
+        "load": {"seconds": round(load_seconds, 3), "peak_mb": round(load_peak / (1024 * 1024), 1)},
+        "tools": {
+            "search_products": search_stats,
+            "get_product_details": details_stats,
+            "get_products": batch_stats,
+        },
+    }
+
+
+def bench_storage(server, iterations: int, seed: int, users: int = 1000) -> dict:
+    """Time the memory and shortlist tools over a pool of synthetic users, then close the storage."""
+    rng = random.Random(seed)
+    user_ids = [f"bench-user-{i}" for i in range(users)]
+    facts = ["prefers minimal styles", "size 9", "avoids leather", "budget under 3000", "likes white"]
+
+    write_calls = [{"user_id": rng.choice(user_ids), "facts": rng.sample(facts, 2)} for _ in range(iterations)]
+    read_calls = [{"user_id": rng.choice(user_ids)} for _ in range(iterations)]
+    save_calls = [{"user_id": rng.choice(user_ids), "items": [f"snkr-{rng.randrange(10**6):07d}" for _ in range(6)]}
+                  for _ in range(iterations)]
+    results = {
+        "write_memory": measure(server.write_memory, write_calls)[0],
+        "read_memory": measure(server.read_memory, read_calls)[0],
+        "save_shortlist": measure(server.save_shortlist, save_calls)[0],
+        "get_shortlist": measure(server.get_shortlist, read_calls)[0],
+    }
+    # Closing flushes the write-behind buffer, so buffered writes aren't free
+    start = time.perf_counter()
+    server.shutdown()
+    results["close_seconds"] = round(time.perf_counter() - start, 4)
+    return results
+
+
+def _print_report(report: dict):
+    out = sys.stderr
+    for run in report["catalog"]:
+        print(f"\n== {run['catalog_size']:,} SKUs ({run['catalog_file_mb']} MB) "
+              f"load {run['load']['seconds']}s, peak {run['load']['peak_mb']} MB", file=out)
+        for tool, stats in run["tools"].items():
+            _print_row(tool, stats, out)
+    print("\n== storage", file=out)
+    for tool, stats in report["storage"].items():
+        if isinstance(stats, dict):
+            _print_row(tool, stats, out)
+
+
+def _print_row(tool: str, stats: dict, out):
+    print(f"  {tool:<22} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+          f"p99 {stats['p99_ms']:>9.3f} ms  {stats['throughput_per_s']:>10,.0f}/s  "
+          f"peak {stats['peak_alloc_kb']:>9,.1f} KB", file=out)
+
+
+def _print_comparison(report: dict, baseline: dict):
+    """p50/p95 of this run against an earlier JSON report, per catalog size and tool."""
+    out = sys.stderr
+    print(f"\n== vs {baseline['meta'].get('commit') or 'baseline'}", file=out)
+    old_runs = {run["catalog_size"]: run for run in baseline.get("catalog", [])}
+    rows = [(f"{run['catalog_size']:,}", tool, stats, old_runs.get(run["catalog_size"], {}).get("tools", {}).get(tool))
+            for run in report["catalog"] for tool, stats in run["tools"].items()]
+    rows += [("storage", tool, stats, baseline.get("storage", {}).get(tool))
+             for tool, stats in report["storage"].items() if isinstance(stats, dict)]
+    for label, tool, new, old in rows:
+        if not old:
+            continue
+        deltas = "  ".join(
+            f"{key} {old[key]:.3f} -> {new[key]:.3f} ms ({new[key] / old[key]:.2f}x)" if old[key] else f"{key} n/a"
+            for key in ("p50_ms", "p95_ms")
+        )
+        print(f"  {label:>9} {tool:<22} {deltas}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the MCP tools on synthetic catalogs")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated catalog sizes (e.g. 1000,10000,100000,1000000)")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per tool per catalog size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", default=QUERIES_PATH, help="query-mix JSON file")
+    parser.add_argument("--output", "-o", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    queries = load_queries(args.queries)
+
+    with tempfile.TemporaryDirectory(prefix="hushh-bench-") as data_dir:
+        # Point the server's catalog and storage at the scratch directory
+        os.environ["HUSHH_DATA_DIR"] = data_dir
+        with open(os.path.join(data_dir, "catalog.json"), "w") as f:
+            f.write("[]")
+        from mcp_server import server
+
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "storage_backend": os.getenv("STORAGE_BACKEND", "sqlite"),
+                "seed": args.seed,
+                "iterations": args.iterations,
+                "queries": os.path.basename(args.queries),
+            },
+            "catalog": [],
+        }
+        for size in sizes:
+            print(f"Benchmarking {size:,} SKUs...", file=sys.stderr)
+            report["catalog"].append(bench_catalog(server, data_dir, size, queries, args.iterations, args.seed))
+        report["storage"] = bench_storage(server, args.iterations, args.seed)
+        report["meta"]["max_rss_mb"] = _max_rss_mb()
+
+    _print_report(report)
+    if args.compare:
+        with open(args.compare) as f:
+            _print_comparison(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import sys
+import json
+import random
+import argparse
+
+# category -> sub_category -> (id prefix, sizes, materials, price median INR, nouns)
+TAXONOMY = {
+    "footwear": {
+        "sneakers": ("snkr", ["6", "7", "8", "9", "10", "11"], ["Canvas", "Leather", "Faux Leather", "Suede", "Knit Mesh"], 2600, ["Sneaker", "Low-Top", "High-Top", "Court Shoe"]),
+        "running": ("run", ["6", "7", "8", "9", "10", "11"], ["Mesh", "Engineered Mesh", "Knit", "Synthetic"], 3400, ["Runner", "Trainer", "Racer"]),
+        "boots": ("boot", ["7", "8", "9", "10", "11"], ["Full Grain Leather", "Suede", "Leather"], 4800, ["Chelsea Boot", "Chukka", "Work Boot"]),
+        "loafers": ("loaf", ["7", "8", "9", "10"], ["Leather", "Suede"], 3900, ["Loafer", "Penny Loafer", "Moccasin"]),
+        "sandals": ("sndl", ["6", "7", "8", "9", "10"], ["Synthetic", "Leather", "Rubber"], 1400, ["Sandal", "Slide", "Flip-Flop"]),
+    },
+    "apparel": {
+        "t-shirts": ("tee", ["S", "M", "L", "XL"], ["Cotton", "Organic Cotton", "Cotton Jersey", "Poly-Cotton Blend"], 1100, ["Crew Tee", "V-Neck Tee", "Pocket Tee", "Oversized Tee"]),
+        "shirts": ("shrt", ["S", "M", "L", "XL"], ["Oxford Cloth", "Linen", "Cotton Twill", "Denim"], 1900, ["Oxford Shirt", "Linen Shirt", "Overshirt"]),
+        "jeans": ("jean", ["28", "30", "32", "34", "36"], ["Denim", "Stretch Denim", "Raw Denim"], 2500, ["Slim Jeans", "Straight Jeans", "Relaxed Jeans"]),
+        "pants": ("pant", ["28", "30", "32", "34", "36"], ["Cotton Twill", "Linen", "Wool Blend"], 2200, ["Chinos", "Trousers", "Cargo Pants"]),
+    },
+    "accessories": {
+        "belts": ("belt", ["S", "M", "L"], ["Leather", "Canvas", "Synthetic Leather"], 1200, ["Belt", "Reversible Belt", "Braided Belt"]),
+        "eyewear": ("eye", ["Universal"], ["Metal", "Acetate", "Polycarbonate"], 1800, ["Aviators", "Wayfarers", "Round Sunglasses"]),
+        "bags": ("bag", ["Universal"], ["Canvas", "Leather", "Nylon"], 2900, ["Backpack", "Tote", "Messenger Bag"]),
+        "watches": ("wtch", ["Universal"], ["Metal", "Leather", "Silicone"], 4500, ["Watch", "Chronograph", "Field Watch"]),
+    },
+}
+
+# Share of SKUs per category (roughly the mix of data/catalog.json)
+CATEGORY_WEIGHTS = {"footwear": 0.5, "apparel": 0.35, "accessories": 0.15}
+
+COLORS = ["white", "black", "blue", "grey", "brown", "beige", "green", "red", "navy", "olive", "pink", "yellow"]
+COLOR_WEIGHTS = [18, 18, 12, 10, 8, 7, 6, 5, 6, 4, 3, 3]
+
+STYLE_KEYWORDS = ["minimal", "classic", "streetwear", "retro", "sporty", "casual", "formal", "rugged",
+                  "vintage", "premium", "everyday", "lightweight", "breathable", "chunky", "sleek",
+                  "outdoor", "summer", "winter", "leather", "canvas", "eco", "bold", "slim", "relaxed"]
+ADJECTIVES = ["Essential", "Classic", "Urban", "Heritage", "Minimalist", "Vintage", "Everyday",
+              "Premium", "Street", "Trail", "Studio", "Coastal", "Retro", "Modern"]
+BRANDS = ["StreetVibe", "Heritage", "ActiveCore", "DailyBase", "SummerBreeze", "UrbanCloud", "Classics",
+          "Coastline", "StepClean", "UrbanLeaf", "RawTone", "TrailForge", "UrbanDeck", "UrbanStep", "Rugged",
+          "NorthLoop", "Kinfolk", "Monsoon", "Saffron", "IronThread"]
+BRAND_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(BRANDS))]  # a few big brands, a long tail
+
+
+def generate_catalog(count: int, seed: int = 42) -> list:
+    """
+    `count` products in the data/catalog.json schema, identical for the same
+    (count, seed). Prices are log-normal around each sub-category's median.
+    """
+    rng = random.Random(seed)
+    subcats = [(cat, sub, spec) for cat, subs in TAXONOMY.items() for sub, spec in subs.items()]
+    weights = [CATEGORY_WEIGHTS[cat] / len(TAXONOMY[cat]) for cat, _, _ in subcats]
+
+    products = []
+    for i, (category, sub_category, spec) in enumerate(rng.choices(subcats, weights, k=count)):
+        prefix, sizes, materials, median_price, nouns = spec
+        color = rng.choices(COLORS, COLOR_WEIGHTS)[0]
+        keywords = [color] + rng.sample(STYLE_KEYWORDS, rng.randint(1, 3))
+        price = max(50, int(round(median_price * rng.lognormvariate(0, 0.35) / 50)) * 50)
+        if rng.random() < 0.3:
+            price -= 1  # "999"-style price points
+        products.append({
+            "product_id": f"{prefix}-{i:07d}",
+            "title": f"{rng.choice(ADJECTIVES)} {color.title()} {rng.choice(nouns)}",
+            "price_inr": price,
+            "brand": rng.choices(BRANDS, BRAND_WEIGHTS)[0],
+            "style_keywords": keywords,
+            "category": category,
+            "sub_category": sub_category,
+            "size": rng.choice(sizes),
+            "material": rng.choice(materials),
+        })
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic catalog.json")
+    parser.add_argument("count", type=int, help="number of SKUs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", "-o", help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    products = generate_catalog(args.count, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(products, f)
+    else:
+        json.dump(products, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
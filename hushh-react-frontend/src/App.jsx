@@ -9,9 +9,34 @@ import './App.css'
 // Use environment variable or fallback to Render backend
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || 'https://ai-shopping-concierge.onrender.com'
 const API_URL = `${BACKEND_URL}/agents/run`
+const STREAM_URL = `${API_URL}/stream`
 const HEALTH_URL = `${BACKEND_URL}/health`
 const CLEAR_URL = `${BACKEND_URL}/agents/clear`
 
+// Read a text/event-stream response body, calling onEvent(event, data) for each event
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const chunk = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of chunk.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
+
 // Generate a unique session ID
 const generateSessionId = () => `session_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`
 
@@ -102,31 +127,21 @@ function AppContent() {
 
     const userMessage = input.trim()
     setInput('')
-    setMessages(prev => [...prev, { role: 'user', content: userMessage }])
+    // Placeholder assistant message, filled in as stream events arrive
+    const assistantId = `assistant_${Date.now()}`
+    setMessages(prev => [
+      ...prev,
+      { role: 'user', content: userMessage },
+      { id: assistantId, role: 'assistant', content: 'Searching...', products: [], questions: [], avoidedKeywords: [] }
+    ])
     setIsLoading(true)
 
-    try {
-      const response = await fetch(API_URL, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          user_id: `guest_${sessionId}`, // Use unique ID to prevent old memory persistence
-          message: userMessage,
-          session_id: sessionId  // Send session ID for conversation tracking
-        })
-      })
-
-      const data = await response.json()
-      setLastApiResponse(data)
-      console.log('=== API RESPONSE ===', JSON.stringify(data, null, 2))
+    const updateAssistant = (patch) => {
+      setMessages(prev => prev.map(m => (m.id === assistantId ? { ...m, ...patch(m) } : m)))
+    }
 
-      const understood = data.understood_request || {}
+    const applyUnderstood = (understood = {}, questions = []) => {
       const constraints = understood.constraints || {}
-      const products = data.results || []
-      console.log('Parsed Products:', products.length)
-
-      const questions = data.clarifying_questions || []
-
       setSessionData({
         category: constraints.category || understood.category,
         budget: constraints.budget_inr_max,
@@ -137,31 +152,59 @@ function AppContent() {
       if (constraints.avoid_keywords?.length) {
         setAvoidKeywords(prev => [...new Set([...prev, ...constraints.avoid_keywords])])
       }
+      updateAssistant(() => ({ questions, avoidedKeywords: constraints.avoid_keywords || [] }))
+    }
 
-      let responseContent = ''
-      if (data.error) {
-        responseContent = `Something went wrong: ${data.error}`
-      } else if (products.length > 0) {
-        responseContent = `Found ${products.length} matches for you.`
-      } else {
-        // Always show this - don't ask questions
-        responseContent = 'No products found matching your search. Try a different query.'
-      }
-
-      setMessages(prev => [...prev, {
-        role: 'assistant',
-        content: responseContent,
-        products,
-        questions,
-        avoidedKeywords: constraints.avoid_keywords || []
-      }])
+    try {
+      const response = await fetch(STREAM_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          user_id: `guest_${sessionId}`, // Use unique ID to prevent old memory persistence
+          message: userMessage,
+          session_id: sessionId  // Send session ID for conversation tracking
+        })
+      })
+      if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`)
+
+      await readEventStream(response, (event, data) => {
+        if (event === 'understood_request') {
+          applyUnderstood(data.understood_request, data.clarifying_questions || [])
+        } else if (event === 'products') {
+          // Render each batch as soon as it is ranked/hydrated
+          updateAssistant(current => {
+            const products = [...current.products, ...(data.results || [])]
+            return { products, content: `Found ${products.length} matches so far...` }
+          })
+        } else if (event === 'done') {
+          setLastApiResponse(data)
+          console.log('=== API RESPONSE ===', JSON.stringify(data, null, 2))
+
+          const products = data.results || []
+          console.log('Parsed Products:', products.length)
+          applyUnderstood(data.understood_request, data.clarifying_questions || [])
+
+          let responseContent = ''
+          if (data.error) {
+            responseContent = `Something went wrong: ${data.error}`
+          } else if (products.length > 0) {
+            responseContent = `Found ${products.length} matches for you.`
+          } else {
+            // Always show this - don't ask questions
+            responseContent = 'No products found matching your search. Try a different query.'
+          }
+          updateAssistant(() => ({ content: responseContent, products }))
+        } else if (event === 'error') {
+          setLastApiResponse(data)
+          updateAssistant(() => ({ content: `Something went wrong: ${data.error}` }))
+        }
+      })
 
     } catch (error) {
       console.error('API Error:', error)
-      setMessages(prev => [...prev, {
-        role: 'assistant',
+      updateAssistant(() => ({
         content: 'Connection issue. The backend might be starting up - please try again.'
-      }])
+      }))
     } finally {
       setIsLoading(false)
     }
@@ -0,0 +1,209 @@
+"""
+Local stand-in for an OpenAI-compatible chat/completions API, for load tests
+without network access or rate limits.
+
+    python -m loadtest.llm_stub --port 9100 --latency lognormal:0.6,0.4 --error-rate 0.02
+    LLM_BASE_URL=http://127.0.0.1:9100/v1 GROQ_API_KEY=stub python main.py
+
+Shopping requests get a `brain` JSON built by agent_core.query_parser from the
+latest user message (carrying category/size/budget over from the previous
+assistant turn, so follow-ups like "black ones" work). Stylist requests get
+advice referencing items from the closet in the prompt. A --script file of
+{"match": regex, "response": object|string} rules overrides both.
+
+Note the OpenAI client retries 429/5xx responses (twice by default), so an
+injected error shows up in the API as extra latency before it fails.
+"""
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from agent_core.query_parser import parse_query
+from agent_core.tokens import estimate_tokens
+
+# Closet items appear as full JSON ("product_id") or compacted ("id")
+_PRODUCT_ID_RE = re.compile(r'"(?:product_)?id":\s*"([^"]+)"')
+
+
+def parse_latency(spec: str):
+    """
+    Turn a latency spec into a sampler returning seconds:
+    "0" / "none", "fixed:S", "uniform:LO,HI", "normal:MEAN,STDDEV" or
+    "lognormal:MEDIAN,SIGMA" (SIGMA of the underlying normal).
+    """
+    if not spec or spec in ("0", "none"):
+        return lambda rng: 0.0
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class StubLLM:
+    """Generates chat.completion responses, latencies and injected failures."""
+
+    def __init__(self, latency: str = "lognormal:0.5,0.4", error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, timeout_rate: float = 0.0, malformed_rate: float = 0.0,
+                 hang_seconds: float = 60.0, script: list = None, seed: int = None):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.malformed_rate = malformed_rate
+        self.hang_seconds = hang_seconds
+        self.script = [(re.compile(rule["match"], re.I), rule["response"]) for rule in (script or [])]
+        self.rng = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.outcomes = Counter()
+        self.tokens = Counter()
+
+    def _fault(self):
+        """Pick an injected failure for this request (None for a normal answer)."""
+        roll = self.rng.random()
+        for fault, rate in (("error", self.error_rate), ("rate_limited", self.rate_limit_rate),
+                            ("timeout", self.timeout_rate), ("malformed", self.malformed_rate)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    async def complete(self, body: dict):
+        """Returns (status code, JSON body) after the sampled latency."""
+        messages = body.get("messages") or []
+        fault = self._fault()
+        self.outcomes[fault or "ok"] += 1
+        if fault == "timeout":
+            await asyncio.sleep(self.hang_seconds)
+        else:
+            await asyncio.sleep(self.sample_latency(self.rng))
+
+        if fault == "error":
+            return 500, {"error": {"message": "Injected upstream error", "type": "server_error"}}
+        if fault == "rate_limited":
+            return 429, {"error": {"message": "Injected rate limit", "type": "rate_limit_exceeded"}}
+
+        content = "{not json" if fault == "malformed" else self.respond(messages)
+        prompt_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        self.tokens["prompt"] += prompt_tokens
+        self.tokens["completion"] += completion_tokens
+        return 200, {
+            "id": f"chatcmpl-stub-{next(self.ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def respond(self, messages: list) -> str:
+        """Assistant content for a conversation: scripted, stylist or shopping."""
+        user_messages = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+        last_user = user_messages[-1] if user_messages else ""
+        for pattern, response in self.script:
+            if pattern.search(last_user):
+                return response if isinstance(response, str) else json.dumps(response)
+
+        system = "\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+        if '"advice"' in system:
+            return json.dumps(self._stylist(system))
+        return json.dumps(self._shopping(messages, last_user))
+
+    @staticmethod
+    def _stylist(system: str) -> dict:
+        referenced = _PRODUCT_ID_RE.findall(system)[:2]
+        advice = "Keep the rest of the outfit neutral and let one piece stand out."
+        if referenced:
+            advice = f"Try it with {' and '.join(referenced)} from your closet. " + advice
+        return {"advice": advice, "referenced_items": referenced}
+
+    @staticmethod
+    def _shopping(messages: list, message: str) -> dict:
+        brain, _ = parse_query(message)
+        previous = {}
+        for m in reversed(messages):
+            if m.get("role") == "assistant":
+                try:
+                    previous = json.loads(m.get("content") or "")
+                except ValueError:
+                    pass
+                break
+        if isinstance(previous, dict) and previous:
+            # A follow-up refines the previous request rather than replacing it
+            if not brain["category"]:
+                brain["query"] = " ".join(filter(None, [brain["query"], previous.get("query")]))
+            for field in ("category", "budget", "size"):
+                brain[field] = brain[field] or previous.get(field)
+            brain["avoid_keywords"] = sorted(set(brain["avoid_keywords"]) | set(previous.get("avoid_keywords") or []))
+        if not brain["query"]:
+            brain["query"] = brain["category"] or "shoes"
+        return brain
+
+    def stats(self) -> dict:
+        return {"requests": sum(self.outcomes.values()), "outcomes": dict(self.outcomes), "tokens": dict(self.tokens)}
+
+
+def create_app(stub: StubLLM) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        status, body = await stub.complete(await request.json())
+        headers = {"retry-after": "1"} if status == 429 else None
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "loadtest"}]}
+
+    @app.get("/stub/stats")
+    async def stats():
+        return stub.stats()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible chat/completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="lognormal:0.5,0.4",
+                        help='"0", "fixed:S", "uniform:LO,HI", "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA"')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share answered with HTTP 429")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share that hang for --hang-seconds")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share answered with invalid JSON content")
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--script", help="JSON file of {match, response} rules")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    stub = StubLLM(args.latency, args.error_rate, args.rate_limit_rate, args.timeout_rate,
+                   args.malformed_rate, args.hang_seconds, script, args.seed)
+
+    import uvicorn
+    uvicorn.run(create_app(stub), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
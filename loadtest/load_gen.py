@@ -0,0 +1,177 @@
+"""
+Drives concurrent multi-turn conversations through /agents/run and reports
+throughput, latency percentiles and error/degradation rates.
+
+    python -m loadtest.load_gen --url http://127.0.0.1:8000 --sessions 200 --concurrency 20
+    python -m loadtest.load_gen --duration 60 --concurrency 50 --output run.json
+
+Each session picks a conversation from loadtest/conversations.json (weighted,
+seeded) and sends its turns in order under one session_id, then clears it.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+import httpx
+
+CONVERSATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.json")
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _percentiles(durations: list) -> dict:
+    ordered = sorted(durations)
+    if not ordered:
+        return {}
+    # Nearest-rank, as in agent_core.metrics
+    stats = {f"p{p}_ms": round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 1)
+             for p in PERCENTILES}
+    stats["mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 1)
+    stats["max_ms"] = round(ordered[-1] * 1000, 1)
+    return stats
+
+
+class LoadRun:
+    """Results of every request sent during one run."""
+
+    def __init__(self):
+        self.latencies = []
+        self.by_turn = defaultdict(list)
+        self.by_agent = defaultdict(list)
+        self.statuses = Counter()
+        self.degraded = Counter()
+        self.degraded_requests = 0
+        self.errors = Counter()
+        self.sessions = 0
+
+    def record(self, turn: int, seconds: float, status, body):
+        self.statuses[str(status)] += 1
+        if status != 200:
+            return
+        self.latencies.append(seconds)
+        self.by_turn[turn].append(seconds)
+        agent = body.get("agent", "unknown")
+        self.by_agent[agent].append(seconds)
+        if body.get("degraded"):
+            self.degraded_requests += 1
+            self.degraded.update(body["degraded"])
+        if body.get("error"):
+            self.errors[agent] += 1
+
+    def report(self, wall: float) -> dict:
+        total = sum(self.statuses.values())
+        ok = self.statuses.get("200", 0)
+        return {
+            "requests": total,
+            "sessions": self.sessions,
+            "duration_seconds": round(wall, 2),
+            "throughput_rps": round(total / wall, 2) if wall else None,
+            "error_rate": round((total - ok) / total, 4) if total else None,
+            "degraded_rate": round(self.degraded_requests / ok, 4) if ok else None,
+            "latency": _percentiles(self.latencies),
+            "latency_by_turn": {str(t + 1): {"requests": len(d), **_percentiles(d)} for t, d in sorted(self.by_turn.items())},
+            "latency_by_agent": {a: {"requests": len(d), **_percentiles(d)} for a, d in sorted(self.by_agent.items())},
+            "statuses": dict(self.statuses),
+            "degraded_stages": dict(self.degraded),
+            "agent_errors": dict(self.errors),
+        }
+
+
+async def run_session(client: httpx.AsyncClient, run: LoadRun, conversation: dict, user_id: str, think_time: float):
+    """Send one conversation's turns in order under a fresh session_id."""
+    session_id = f"load-{uuid.uuid4().hex[:12]}"
+    for turn, message in enumerate(conversation["turns"]):
+        start = time.perf_counter()
+        try:
+            response = await client.post("/agents/run", json={"user_id": user_id, "message": message, "session_id": session_id})
+            body = response.json() if response.status_code == 200 else None
+            run.record(turn, time.perf_counter() - start, response.status_code, body)
+        except httpx.HTTPError as e:
+            run.record(turn, time.perf_counter() - start, type(e).__name__, None)
+        if think_time:
+            await asyncio.sleep(random.expovariate(1 / think_time))
+    try:
+        await client.post("/agents/clear", json={"session_id": session_id})
+    except httpx.HTTPError:
+        pass
+    run.sessions += 1
+
+
+async def run_load(url: str, conversations: list, sessions: int, concurrency: int, duration: float,
+                   users: int, think_time: float, timeout: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    weights = [c.get("weight", 1) for c in conversations]
+    run = LoadRun()
+    next_session = iter(range(sys.maxsize))
+    deadline = time.monotonic() + duration if duration else None
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            while True:
+                index = next(next_session)
+                if (deadline and time.monotonic() >= deadline) or (not deadline and index >= sessions):
+                    return
+                conversation = rng.choices(conversations, weights)[0]
+                await run_session(client, run, conversation, f"load-user-{index % users}", think_time)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        report = run.report(time.perf_counter() - start)
+
+        # Server-side counters (LLM cache, intent source, breaker, background queue)
+        try:
+            report["server_stats"] = (await client.get("/agents/stats")).json()
+        except (httpx.HTTPError, ValueError):
+            report["server_stats"] = None
+    return report
+
+
+def _print_report(report: dict):
+    out = sys.stderr
+    latency = report["latency"]
+    print(f"\n{report['requests']} requests / {report['sessions']} sessions in {report['duration_seconds']}s "
+          f"-> {report['throughput_rps']} req/s", file=out)
+    print(f"errors {report['error_rate']:.2%}  degraded {report['degraded_rate'] or 0:.2%}  "
+          f"statuses {report['statuses']}  degraded stages {report['degraded_stages']}", file=out)
+    if latency:
+        print("latency  " + "  ".join(f"{k} {v}" for k, v in latency.items()), file=out)
+    for turn, stats in report["latency_by_turn"].items():
+        print(f"  turn {turn:>2}: {stats['requests']:>5} req  p50 {stats['p50_ms']} ms  p95 {stats['p95_ms']} ms", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent multi-turn load against /agents/run")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=100, help="conversations to run (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of a session count")
+    parser.add_argument("--concurrency", type=int, default=10, help="conversations in flight at once")
+    parser.add_argument("--users", type=int, default=50, help="distinct user_ids to spread sessions over")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between turns (seconds)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (seconds)")
+    parser.add_argument("--conversations", default=CONVERSATIONS_PATH)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", "-o", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    with open(args.conversations) as f:
+        conversations = json.load(f)
+    report = asyncio.run(run_load(args.url, conversations, args.sessions, args.concurrency, args.duration,
+                                  args.users, args.think_time, args.timeout, args.seed))
+    report["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    _print_report(report)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
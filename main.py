@@ -1,22 +1,29 @@
 import os
 import json
 import time
-import traceback
-import sys
+import logging
 from fastapi import FastAPI, Request, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, ConfigDict
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv()
-groq_key = os.getenv("GROQ_API_KEY")
-openai_key = os.getenv("OPENAI_API_KEY")
-print(f"DEBUG: GROQ_API_KEY loaded: {bool(groq_key)}")
-if groq_key:
-    print(f"DEBUG: Groq Key starts with: {groq_key[:10]}...")
-print(f"DEBUG: OPENAI_API_KEY loaded: {bool(openai_key)}")
+
+from agent_core.log import configure_logging
+configure_logging()
+logger = logging.getLogger("hushh.api")
+logger.info("API keys loaded", extra={
+    "groq_api_key": bool(os.getenv("GROQ_API_KEY")), "openai_api_key": bool(os.getenv("OPENAI_API_KEY"))
+})
 
 from agent_core.logic import ShoppingAgent
 from agent_core.fashion_logic import FashionStylistAgent
+from agent_core.tool_transport import create_tool_transport
+from agent_core.llm import close_llm_client, get_llm_client
+from agent_core.llm_cache import get_llm_cache
+from agent_core.scheduler import BackgroundTaskQueue
+from agent_core.closet_store import get_closet_store
+from agent_core.metrics import metrics, start_request_spans, server_timing
 from fastapi.middleware.cors import CORSMiddleware
 
 @asynccontextmanager
@@ -26,7 +33,7 @@ async def lifespan(app: FastAPI):
         path = os.path.join("data", filename)
         if not os.path.exists(path):
             with open(path, "w") as f:
-                json.dump([] if filename != "catalog.json" else [
+                json.dump({} if filename == "closet.json" else [] if filename != "catalog.json" else [
                     {
                         "product_id": "snkr-001", 
                         "title": "Default Slim Sneaker", 
@@ -35,7 +42,19 @@ async def lifespan(app: FastAPI):
                         "style_keywords": ["minimal", "white"]
                     }
                 ], f)
-    yield
+
+    # Tool backend: pooled MCP stdio sessions or direct in-process calls (TOOL_TRANSPORT)
+    app.state.tools = create_tool_transport()
+    await app.state.tools.start()
+    # Side-effect-only steps (shortlist/memory writes) run after the response
+    app.state.background = BackgroundTaskQueue()
+    await app.state.background.start()
+    try:
+        yield
+    finally:
+        await app.state.background.close()
+        await app.state.tools.close()
+        await close_llm_client()
 
 app = FastAPI(title="Hushh Power Agent Platform", lifespan=lifespan)
 
@@ -56,12 +75,39 @@ class AgentRequest(BaseModel):
 class ClearConversationRequest(BaseModel):
     session_id: str
 
+class FeedbackRequest(BaseModel):
+    session_id: str
+    product_id: str
+    liked: bool  # False keeps the product out of this session's later results
+
+class ClosetItem(BaseModel):
+    model_config = ConfigDict(extra="allow")  # any other item fields (style_keywords, material, ...) are kept
+    product_id: str
+    title: str
+    color: str = None
+    type: str = None
+
+# Set METRICS_SERVER_TIMING=1 to return per-stage timings in a Server-Timing header
+SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") == "1"
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
+    spans = start_request_spans()
     response = await call_next(request)
     process_time = time.time() - start_time
-    print(f"Path: {request.url.path} | Duration: {process_time:.4f}s")
+    # Label by route template, not raw path, so session IDs don't create new series
+    route = request.scope.get("route")
+    metrics.observe(
+        "hushh_http_request_duration_seconds", process_time,
+        method=request.method, path=getattr(route, "path", "unmatched"), status=response.status_code
+    )
+    # Streamed responses send their headers before any stage has finished
+    if SERVER_TIMING and spans:
+        response.headers["Server-Timing"] = server_timing(spans + [("total", process_time)])
+    logger.info("request", extra={
+        "path": request.url.path, "status": response.status_code, "duration_ms": round(process_time * 1000, 1)
+    })
     return response
 
 @app.post("/agents/run")
@@ -72,55 +118,165 @@ async def run_agent(request: AgentRequest):
         
         # Intent routing
         if any(word in msg for word in ["style", "match", "wear with", "advice", "look"]):
-            print(f"--- ROUTING TO: FashionStylistAgent ---")
             agent = FashionStylistAgent(user_id=request.user_id)
+            logger.info("Routing to FashionStylistAgent")
             response = await agent.process_request(request.message)
         else:
-            print(f"--- ROUTING TO: ShoppingAgent (session: {session_id}) ---")
-            agent = ShoppingAgent(user_id=request.user_id, session_id=session_id)
+            agent = ShoppingAgent(user_id=request.user_id, session_id=session_id, tools=app.state.tools, background=app.state.background)
+            logger.info("Routing to ShoppingAgent")
             response = await agent.process_request(request.message)
         
         return response
 
     except ExceptionGroup as eg:
-        print("\n" + "!"*60)
-        print("DIAGNOSTIC: UNPACKING TASKGROUP ERRORS")
         for i, error in enumerate(eg.exceptions):
-            print(f"\n[SUB-ERROR {i+1}]:")
-            traceback.print_exception(type(error), error, error.__traceback__)
-        print("!"*60 + "\n")
+            logger.error("TaskGroup sub-error %d/%d", i + 1, len(eg.exceptions),
+                         exc_info=(type(error), error, error.__traceback__))
         
         raise HTTPException(
             status_code=500, 
             detail={"error": "TaskGroup loop failed", "sub_errors": [str(e) for e in eg.exceptions]}
         )
     except Exception as e:
-        print(f"CRITICAL ERROR: {traceback.format_exc()}")
+        logger.exception("General agent failure")
         raise HTTPException(
             status_code=500, 
             detail={"error": "General Agent failure", "trace": str(e)}
         )
 
+def _sse(event: str, data) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/agents/run/stream")
+async def run_agent_stream(request: AgentRequest):
+    """
+    Same routing as /agents/run, streamed as Server-Sent Events:
+    `understood_request`, then one or more `products` batches, then `done`
+    (the full /agents/run response) or `error`.
+    """
+    msg = request.message.lower()
+    session_id = request.session_id or request.user_id
+
+    async def events():
+        try:
+            if any(word in msg for word in ["style", "match", "wear with", "advice", "look"]):
+                # The stylist answers in one LLM call, so it streams as a single final event
+                agent = FashionStylistAgent(user_id=request.user_id)
+                logger.info("Routing to FashionStylistAgent (stream)")
+                yield _sse("done", await agent.process_request(request.message))
+                return
+            agent = ShoppingAgent(user_id=request.user_id, session_id=session_id, tools=app.state.tools, background=app.state.background)
+            logger.info("Routing to ShoppingAgent (stream)")
+            async for event, data in agent.stream_request(request.message):
+                yield _sse(event, data)
+        except Exception as e:
+            logger.exception("General agent failure (stream)")
+            yield _sse("error", {"error": "General Agent failure", "trace": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so each event reaches the browser as it is sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/agents/clear")
 async def clear_conversation(request: ClearConversationRequest):
     """Clear conversation history for a session - used when starting a new chat."""
-    success = ShoppingAgent.clear_conversation(request.session_id)
+    success = await ShoppingAgent.clear_conversation(request.session_id)
     return {
         "success": success,
         "message": "Conversation cleared" if success else "No conversation found for this session",
         "session_id": request.session_id
     }
 
+@app.post("/agents/feedback")
+async def record_feedback(request: FeedbackRequest):
+    """Like/dislike a product shown in a session; disliked ones are not shown again."""
+    state = await ShoppingAgent.record_feedback(request.session_id, request.product_id, request.liked)
+    return {"session_id": request.session_id, "liked": state["liked"], "rejected": state["rejected"]}
+
 @app.get("/agents/session/{session_id}")
 async def get_session_info(session_id: str):
     """Get info about a conversation session."""
-    count = ShoppingAgent.get_conversation_count(session_id)
+    stats = await ShoppingAgent.get_conversation_stats(session_id)
     return {
         "session_id": session_id,
-        "message_count": count,
-        "has_history": count > 0
+        "message_count": stats["message_count"],
+        "has_history": stats["message_count"] > 0,
+        "stats": stats,
+        "store": await ShoppingAgent.get_conversation_stats()
     }
 
+@app.get("/closet/{user_id}")
+async def get_closet(user_id: str):
+    """A user's wardrobe, as used by the stylist."""
+    items = get_closet_store().get(user_id)
+    return {"user_id": user_id, "items": items, "count": len(items)}
+
+@app.post("/closet/{user_id}/items")
+async def add_closet_item(user_id: str, item: ClosetItem):
+    """Add an item to a user's wardrobe (an existing product_id is replaced)."""
+    count = get_closet_store().add_item(user_id, item.model_dump(exclude_none=True))
+    return {"user_id": user_id, "product_id": item.product_id, "count": count}
+
+@app.delete("/closet/{user_id}/items/{product_id}")
+async def remove_closet_item(user_id: str, product_id: str):
+    """Remove one item from a user's wardrobe."""
+    if not get_closet_store().remove_item(user_id, product_id):
+        raise HTTPException(status_code=404, detail="Item not in closet")
+    return {"user_id": user_id, "product_id": product_id, "removed": True}
+
+@app.get("/agents/stats")
+async def get_agent_stats():
+    """Intent-extraction, cache and background-queue counters for this worker."""
+    llm_cache = get_llm_cache()
+    return {
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "intent": ShoppingAgent.get_intent_stats(),
+        "speculative_search": ShoppingAgent.get_speculation_stats(),
+        "llm_circuit": get_llm_client().breaker.stats(),
+        "closet_cache": get_closet_store().stats(),
+        "background": app.state.background.stats()
+    }
+
+def _collect_gauges():
+    """Cache, queue and breaker state sampled at scrape time."""
+    samples = []
+    llm_cache = get_llm_cache()
+    if llm_cache:
+        cache = llm_cache.stats()
+        samples += [
+            ("hushh_llm_cache_lookups_total", "counter", "LLM cache lookups by result", {"result": "hit"}, cache["hits"]),
+            ("hushh_llm_cache_lookups_total", "counter", "LLM cache lookups by result", {"result": "miss"}, cache["misses"]),
+        ]
+    intent = ShoppingAgent.get_intent_stats()
+    samples += [
+        ("hushh_intent_requests_total", "counter", "Requests by intent source", {"source": "fast_path"}, intent["fast_path"]),
+        ("hushh_intent_requests_total", "counter", "Requests by intent source", {"source": "llm"}, intent["llm"]),
+    ]
+    background = app.state.background.stats()
+    samples.append(("hushh_background_pending", "gauge", "Jobs waiting in the background queue", {}, background["pending"]))
+    samples.append(("hushh_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is not closed", {},
+                    int(get_llm_client().breaker.state != "closed")))
+    return samples
+
+metrics.add_collector(_collect_gauges)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of this worker's latency summaries and counters."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/trace/{trace_id}")
+async def get_trace(trace_id: str):
+    """Stage spans recorded for one request (trace_id is returned in every agent response)."""
+    spans = metrics.trace(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired trace_id")
+    return {"trace_id": trace_id, "spans": spans}
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "platform": "hushh-power-agent-mvp"}
@@ -0,0 +1,97 @@
+import os
+import json
+import logging
+import time
+import hashlib
+import threading
+from mcp_server.search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """An immutable, fully parsed version of the catalog."""
+
+    def __init__(self, products: list, version: int, digest: str = None):
+        self.products = products
+        self.version = version
+        self.digest = digest
+        # ID -> product hash index for direct lookups
+        self.by_id = {str(p.get("product_id")): p for p in products}
+        # Inverted index used by search_products
+        self.index = SearchIndex(products)
+
+
+class CatalogStore:
+    """
+    Keeps the parsed catalog in memory and hot-reloads it when the file changes.
+
+    Readers call `get()` and work on the returned snapshot; a reload builds a
+    new snapshot on a background thread and swaps the reference in one
+    assignment, so readers never see a half-loaded catalog and never wait on
+    a reload (they keep getting the old snapshot until the new one is ready).
+    The file is stat'ed at most once per `check_interval` seconds; a changed
+    mtime/size triggers a content hash, and only a changed hash bumps `version`.
+    The first load, in the constructor, is synchronous.
+    """
+
+    def __init__(self, path: str, check_interval: float = None):
+        self.path = path
+        self.check_interval = check_interval if check_interval is not None \
+            else float(os.getenv("CATALOG_RELOAD_INTERVAL", 1.0))
+        self._snapshot = CatalogSnapshot([], version=0)
+        self._stat_key = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._reload_lock.acquire()
+        self._reload()
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def get(self) -> CatalogSnapshot:
+        """Return the current catalog snapshot, starting a background reload if one is due."""
+        if time.monotonic() - self._last_check >= self.check_interval:
+            # A reload already in progress serves everyone; don't start another
+            if self._reload_lock.acquire(blocking=False):
+                self._last_check = time.monotonic()
+                self._reload_thread = threading.Thread(target=self._reload, name="catalog-reload", daemon=True)
+                self._reload_thread.start()
+        return self._snapshot
+
+    def wait_for_reload(self, timeout: float = None):
+        """Block until an in-progress background reload finishes (tests, benchmarks)."""
+        thread = self._reload_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _reload(self):
+        """Check the file and swap in a new snapshot if it changed; the caller holds _reload_lock."""
+        try:
+            self._last_check = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                logger.warning("Catalog file not found: %s", self.path)
+                return
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            if stat_key == self._stat_key:
+                return
+
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha1(raw).hexdigest()
+            if digest != self._snapshot.digest:
+                started = time.perf_counter()
+                products = json.loads(raw)
+                self._snapshot = CatalogSnapshot(products, self._snapshot.version + 1, digest)
+                logger.info("Loaded catalog v%d (%d items) in %.2fs", self._snapshot.version, len(products),
+                            time.perf_counter() - started)
+            self._stat_key = stat_key
+        except Exception as e:
+            # Keep serving the previous version if the new file is unreadable/partial
+            logger.error("Error loading catalog %s: %s", self.path, e)
+        finally:
+            self._reload_lock.release()
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Keyword bitmaps are materialized from posting lists on demand and kept as
+# packed bits (1 bit per row); the hot ones are cached up to this many bytes
+BITMAP_CACHE_BYTES = int(os.getenv("BITMAP_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+def _encode(values: list):
+    """Dictionary-encode a list of strings into (int32 codes, value -> code map)."""
+    codes = {}
+    column = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int32, count=len(values))
+    return column, codes
+
+
+class CatalogColumns:
+    """
+    Columnar view of one catalog snapshot for vectorized filtering.
+
+    price is an int64 array, category and size are dictionary-encoded int32
+    codes, and text-token membership is a packed bitmap per token. Every
+    strict filter compiles to a boolean mask, so a query's constraints are
+    evaluated in a few NumPy passes instead of a Python loop per product.
+    """
+
+    def __init__(self, products: list, text_postings: dict):
+        self.size = len(products)
+        self.price = np.fromiter((int(p.get("price_inr", 0) or 0) for p in products),
+                                 dtype=np.int64, count=self.size)
+        self.category, self.category_codes = _encode([str(p.get("category", "")).lower() for p in products])
+        self.sizes, self.size_codes = _encode([str(p.get("size", "")).lower() for p in products])
+        self._text_postings = text_postings
+        self._bitmaps = OrderedDict()  # token -> packed bits, LRU order
+        self._bitmap_bytes = 0
+        self._bitmap_lock = threading.Lock()  # searches run on worker threads
+
+    def _packed(self, token: str) -> np.ndarray:
+        """Packed bits (np.packbits) of the rows whose text fields contain `token`."""
+        with self._bitmap_lock:
+            packed = self._bitmaps.get(token)
+            if packed is not None:
+                self._bitmaps.move_to_end(token)
+                return packed
+        mask = np.zeros(self.size, dtype=bool)
+        rows = self._text_postings.get(token)
+        if rows is not None:
+            mask[rows] = True
+        packed = np.packbits(mask)
+        with self._bitmap_lock:
+            if token not in self._bitmaps:
+                self._bitmaps[token] = packed
+                self._bitmap_bytes += packed.nbytes
+                while self._bitmap_bytes > BITMAP_CACHE_BYTES and self._bitmaps:
+                    self._bitmap_bytes -= self._bitmaps.popitem(last=False)[1].nbytes
+        return packed
+
+    def _unpack(self, packed: np.ndarray) -> np.ndarray:
+        return np.unpackbits(packed, count=self.size).view(bool)
+
+    def bitmap(self, token: str) -> np.ndarray:
+        """Boolean mask of the rows whose text fields contain `token`."""
+        return self._unpack(self._packed(token))
+
+    def _any_token(self, tokens) -> np.ndarray:
+        # OR the packed bitmaps (8 rows per byte), unpack once
+        packed = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for token in tokens:
+            packed |= self._packed(token)
+        return self._unpack(packed)
+
+    def filter_mask(self, budget_max: int, category: str = None, sizes: set = None,
+                    colors: list = None, avoid_tokens: list = None) -> np.ndarray:
+        """Compile the strict filters into a single boolean mask over all rows."""
+        mask = self.price <= budget_max
+        if category:
+            code = self.category_codes.get(category)
+            if code is None:
+                return np.zeros(self.size, dtype=bool)
+            mask &= self.category == code
+        if sizes:
+            codes = [self.size_codes[s] for s in sizes if s in self.size_codes]
+            mask &= np.isin(self.sizes, codes)
+        if colors:
+            mask &= self._any_token(colors)
+        if avoid_tokens:
+            mask &= ~self._any_token(avoid_tokens)
+        return mask
@@ -0,0 +1,138 @@
+import re
+from collections import defaultdict
+import numpy as np
+from mcp_server.columnar import CatalogColumns
+
+# Category synonym mapping - maps query terms to standard categories
+CATEGORY_MAP = {
+    # Footwear
+    "sneakers": "footwear", "sneaker": "footwear", "shoes": "footwear",
+    "shoe": "footwear", "boots": "footwear", "sandals": "footwear",
+    "loafers": "footwear", "footwear": "footwear",
+    # Apparel
+    "shirts": "apparel", "shirt": "apparel", "t-shirts": "apparel",
+    "t-shirt": "apparel", "tee": "apparel", "tees": "apparel",
+    "pants": "apparel", "jeans": "apparel", "clothes": "apparel",
+    "clothing": "apparel", "apparel": "apparel",
+    # Accessories
+    "sunglasses": "accessories", "belts": "accessories", "bags": "accessories",
+    "watches": "accessories", "accessories": "accessories"
+}
+
+# If the query names one of these colours, the product text MUST contain it
+COMMON_COLORS = {"white", "black", "red", "blue", "green", "yellow", "pink", "purple", "brown", "grey", "gray", "beige", "gold", "silver"}
+
+STOP_WORDS = {"i", "want", "need", "looking", "for", "a", "an", "the", "some", "show", "me", "of", "size", "with"}
+
+# Score contributed by a query token found in each field
+FIELD_WEIGHTS = {"title": 3, "sub_category": 2, "style_keywords": 1, "material": 1, "brand": 1}
+
+# Fields checked by the exclusion and colour rules
+TEXT_FIELDS = ("title", "sub_category", "material", "style_keywords")
+
+CATEGORY_MATCH_SCORE = 10
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Handle multiple sizes (e.g. "8 and 9", "8, 9", "8 or 9")
+_SIZE_SPLIT_RE = re.compile(r"[,|/]+|\s+and\s+|\s+or\s+")
+
+
+def _stem(token: str) -> str:
+    """Fold simple plurals so 'sneaker' matches 'sneakers'."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Lowercase, split on non-alphanumerics and stem."""
+    return [_stem(t) for t in _TOKEN_RE.findall(str(text).lower())]
+
+
+def normalize_category(category):
+    if not category:
+        return None
+    cat_lower = category.lower().strip()
+    return CATEGORY_MAP.get(cat_lower, cat_lower)
+
+
+def parse_sizes(size) -> set:
+    if not size:
+        return set()
+    return {s.strip().lower() for s in _SIZE_SPLIT_RE.split(str(size)) if s.strip()}
+
+
+def _field_text(product: dict, field: str) -> str:
+    value = product.get(field, "")
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return str(value or "")
+
+
+def _freeze(postings: dict) -> dict:
+    """Turn token -> set(rows) into token -> sorted int32 row array."""
+    return {token: np.fromiter(sorted(rows), dtype=np.int32, count=len(rows)) for token, rows in postings.items()}
+
+
+class SearchIndex:
+    """
+    Tokenized inverted index plus columnar filter arrays over one catalog snapshot.
+
+    Each field maps token -> sorted array of row numbers (posting list).
+    Strict filters (budget, category, size, colour, exclusions) are evaluated
+    as one vectorized mask by CatalogColumns; only the surviving rows are
+    scored, by adding field weights along the postings of the query tokens.
+    """
+
+    def __init__(self, products: list):
+        self.products = products
+        postings = {field: defaultdict(set) for field in FIELD_WEIGHTS}
+        text_postings = defaultdict(set)
+
+        for row, p in enumerate(products):
+            for field in FIELD_WEIGHTS:
+                for token in tokenize(_field_text(p, field)):
+                    postings[field][token].add(row)
+            for field in TEXT_FIELDS:
+                for token in tokenize(_field_text(p, field)):
+                    text_postings[token].add(row)
+
+        self.postings = {field: _freeze(field_postings) for field, field_postings in postings.items()}
+        self.columns = CatalogColumns(products, _freeze(text_postings))
+
+    def search(self, query: str, budget_max: int = 10000, avoid_terms: list = None,
+               category: str = None, size=None):
+        """
+        Return (scores, rows) arrays for every product that passes the filters,
+        unsorted. `category` must already be normalized.
+        """
+        raw_tokens = _TOKEN_RE.findall(query.lower())
+        query_tokens = [_stem(t) for t in raw_tokens if t not in STOP_WORDS]
+        avoid_tokens = [t for term in (avoid_terms or []) for t in tokenize(term)]
+
+        # 1. STRICT FILTERS: category, size, budget, colour and exclusions in one mask
+        mask = self.columns.filter_mask(
+            budget_max,
+            category=category,
+            sizes=parse_sizes(size),
+            colors=[t for t in raw_tokens if t in COMMON_COLORS],
+            avoid_tokens=avoid_tokens,
+        )
+        survivors = np.flatnonzero(mask)
+        if survivors.size == 0:
+            return np.empty(0, dtype=np.int32), survivors
+
+        # 2. SCORE: category base score + per-field token weights along the postings
+        scores = np.zeros(self.columns.size, dtype=np.int32)
+        if category:
+            scores[survivors] += CATEGORY_MATCH_SCORE
+        for token in query_tokens:
+            for field, weight in FIELD_WEIGHTS.items():
+                rows = self.postings[field].get(token)
+                if rows is not None:
+                    scores[rows] += weight
+
+        # Only products with a positive score are results
+        survivor_scores = scores[survivors]
+        keep = survivor_scores > 0
+        return survivor_scores[keep], survivors[keep]
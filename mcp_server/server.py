@@ -2,40 +2,70 @@ import sys
 import json
 import os
 import asyncio
+import base64
+import heapq
+import logging
 from typing import Optional
 from mcp.server.fastmcp import FastMCP
 
+# Absolute path calculation to ensure data files are always found regardless of execution context
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# HUSHH_DATA_DIR points the server at another catalog/storage directory (e.g. benchmarks)
+DATA_DIR = os.path.abspath(os.getenv("HUSHH_DATA_DIR") or os.path.join(CURRENT_DIR, "..", "data"))
+
+# Make the project root importable when launched as a script (stdio transport)
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from mcp_server.catalog_store import CatalogStore
+from mcp_server.search_index import normalize_category
+from mcp_server.storage import create_storage
+from agent_core.log import configure_logging, preview
+
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    # stdout carries the MCP protocol, so logs go to stderr (set up before the
+    # catalog and storage below log their startup)
+    configure_logging()
+
 # Initialize FastMCP
 mcp = FastMCP("Shopping Assistant")
 
-# Absolute path calculation to ensure data files are always found regardless of execution context
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.abspath(os.path.join(CURRENT_DIR, "..", "data"))
-
-def _safe_load(filename, default=[]):
-    """Safely loads JSON data from the data directory."""
-    path = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(path):
-        print(f"[DEBUG] File not found: {path}", file=sys.stderr)
-        return default
+# Parsed catalog kept in memory; reloaded only when catalog.json changes
+CATALOG = CatalogStore(os.path.join(DATA_DIR, "catalog.json"))
+
+# Memory facts and shortlists (SQLite by default, JSON files for dev)
+STORAGE = create_storage(DATA_DIR)
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+def _encode_cursor(offset, catalog):
+    # The content digest identifies the catalog across server processes
+    # (version numbers are per-process reload counters)
+    raw = json.dumps({"o": offset, "v": catalog.version, "d": (catalog.digest or "")[:16]}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor, catalog):
+    """
+    Returns (offset, stale) for a cursor. A cursor from another catalog
+    version would page into a different ordering, so it restarts at 0 with
+    stale=True; a malformed cursor also restarts at 0.
+    """
     try:
-        with open(path, "r") as f:
-            data = json.load(f)
-            print(f"[DEBUG] Loaded {len(data)} items from {filename}", file=sys.stderr)
-            return data
-    except Exception as e:
-        print(f"[DEBUG] Error loading {filename}: {e}", file=sys.stderr)
-        return default
-
-def _safe_save(filename, data):
-    """Safely persists JSON data with proper formatting."""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    path = os.path.join(DATA_DIR, filename)
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = max(0, int(data["o"]))
+    except Exception:
+        return 0, False
+    if data.get("d") != (catalog.digest or "")[:16]:
+        return 0, True
+    return offset, False
 
 @mcp.tool()
-def search_products(query: str, budget_max: int = 10000, avoid_keywords: any = None, category: Optional[str] = None, size: Optional[str] = None):
+def search_products(query: str, budget_max: int = 10000, avoid_keywords: any = None, category: Optional[str] = None, size: Optional[str] = None,
+                    limit: int = SEARCH_DEFAULT_LIMIT, offset: int = 0, cursor: Optional[str] = None):
     """
     Searches the product catalog with strict filters.
     Args:
@@ -44,21 +74,19 @@ def search_products(query: str, budget_max: int = 10000, avoid_keywords: any = N
         avoid_keywords: Keywords to exclude
         category: Category filter (footwear, apparel, accessories)
         size: Size filter (e.g., "9", "M", "L")
+        limit: Maximum number of products to return (1-100, default 20)
+        offset: Number of ranked products to skip
+        cursor: Opaque `next_cursor` from a previous page (overrides offset)
+    Returns the requested page plus `total` (all matches) and `next_cursor`.
+    If the catalog changed since the cursor was issued, paging restarts at
+    the first page and `cursor_stale` is true.
     """
-    print(f"\n{'='*60}", file=sys.stderr)
-    print(f"[SEARCH] Called with:", file=sys.stderr)
-    print(f"  query: '{query}'", file=sys.stderr)
-    print(f"  budget_max: {budget_max}", file=sys.stderr)
-    print(f"  avoid_keywords (raw): {avoid_keywords}", file=sys.stderr)
-    print(f"  avoid_keywords type: {type(avoid_keywords)}", file=sys.stderr)
-    
-    products = _safe_load("catalog.json")
-    print(f"[SEARCH] Loaded {len(products)} products from catalog", file=sys.stderr)
+    catalog = CATALOG.get()
+    products = catalog.products
     
     # Standardize exclusion list
     if isinstance(avoid_keywords, str):
         avoid_list = avoid_keywords.lower().split()
-        print(f"[SEARCH] Parsed string to list: {avoid_list}", file=sys.stderr)
     elif isinstance(avoid_keywords, list):
         # FLATTEN NESTED LISTS - THIS IS THE BUG FIX
         flat_list = []
@@ -68,167 +96,117 @@ def search_products(query: str, budget_max: int = 10000, avoid_keywords: any = N
             else:
                 flat_list.append(str(item).lower())
         avoid_list = flat_list
-        print(f"[SEARCH] Flattened list: {avoid_list}", file=sys.stderr)
     else:
         avoid_list = []
-        print(f"[SEARCH] No avoid keywords provided", file=sys.stderr)
-
-    # Category synonym mapping - maps query terms to standard categories
-    CATEGORY_MAP = {
-        # Footwear
-        "sneakers": "footwear", "sneaker": "footwear", "shoes": "footwear",
-        "shoe": "footwear", "boots": "footwear", "sandals": "footwear",
-        "loafers": "footwear", "footwear": "footwear",
-        # Apparel
-        "shirts": "apparel", "shirt": "apparel", "t-shirts": "apparel",
-        "t-shirt": "apparel", "tee": "apparel", "tees": "apparel",
-        "pants": "apparel", "jeans": "apparel", "clothes": "apparel",
-        "clothing": "apparel", "apparel": "apparel",
-        # Accessories
-        "sunglasses": "accessories", "belts": "accessories", "bags": "accessories",
-        "watches": "accessories", "accessories": "accessories"
-    }
-    
+
     # Normalize category to standard form
-    normalized_category = None
-    if category:
-        cat_lower = category.lower().strip()
-        normalized_category = CATEGORY_MAP.get(cat_lower, cat_lower)
+    normalized_category = normalize_category(category)
     
-    # Debug
-    print(f"[SEARCH] Query: {query}, Category: {category} -> {normalized_category}, Size: {size}, Budget: {budget_max}, Avoid: {avoid_list}", file=sys.stderr)
+    # Vectorized filtering + postings-based scoring against the snapshot's index
+    scores, rows = catalog.index.search(query, budget_max=budget_max, avoid_terms=avoid_list,
+                                        category=normalized_category, size=size)
     
-    query_words = [w.lower() for w in query.split()]
-    results = []
-
-    for p in products:
-        title = p.get('title', "").lower()
-        keywords = [k.lower() for k in p.get('style_keywords', [])]
-        price = p.get('price_inr', 0)
-        
-        product_category = p.get('category', "").lower()
-        product_sub_category = p.get('sub_category', "").lower()
-        product_size = str(p.get('size', "")).lower()
-        product_material = p.get('material', "").lower()
-        product_brand = p.get('brand', "").lower()
-        
-        # 1. STRICT CATEGORY FILTER - If category specified, product MUST match
-        if normalized_category and product_category != normalized_category:
-            continue  # Skip products not in the requested category
-        
-        # 2. SIZE FILTER
-        if size:
-            # Handle multiple sizes (e.g. "8 and 9", "8, 9", "8 or 9")
-            import re
-            requested_sizes = [s.strip().lower() for s in re.split(r'[,|/]+|\s+and\s+|\s+or\s+', str(size)) if s.strip()]
-            
-            if requested_sizes:
-                # If product size matches ANY of the requested sizes
-                if product_size not in requested_sizes:
-                    continue
-        
-        # 3. EXCLUSION CHECK
-        all_text = f"{title} {product_sub_category} {product_material} {' '.join(keywords)}"
-        is_excluded = any(word in all_text for word in avoid_list)
-        if is_excluded:
-            continue
-            
-        # 4. STRICT COLOR FILTER (Heuristic)
-        # If query contains a common color, that color MUST appear in product text
-        COMMON_COLORS = {"white", "black", "red", "blue", "green", "yellow", "pink", "purple", "brown", "grey", "gray", "beige", "gold", "silver"}
-        query_colors = [w for w in query_words if w in COMMON_COLORS]
-        
-        if query_colors:
-            # Check if ANY of the asked colors are in the product
-            # (Relaxed: matches "white sneakers" to "white" but not "red")
-            has_color = any(c in all_text for c in query_colors)
-            if not has_color:
-                continue
-
-        # 4. CALCULATE MATCH SCORE
-        match_score = 0
-        
-        # Base score if category matches (so all products in category show up)
-        if normalized_category and product_category == normalized_category:
-            match_score += 10
-        
-        # Bonus for query word matches
-        for word in query_words:
-            if word in ["i", "want", "need", "looking", "for", "a", "an", "the", "some", "show", "me", "of", "size", "with"]:
-                continue
-            if word in title:
-                match_score += 3
-            if word in product_sub_category:
-                match_score += 2
-            for kw in keywords:
-                if word in kw:
-                    match_score += 1
-        
-        # 5. BUDGET FILTER & ADD TO RESULTS
-        if match_score > 0 and price <= budget_max:
-            results.append({**p, '_score': match_score})
-    
-    # Sort by score (desc), then price (asc)
-    results.sort(key=lambda x: (-x.get('_score', 0), x.get('price_inr', 0)))
+    # Page bounds
+    limit = min(max(int(limit or SEARCH_DEFAULT_LIMIT), 1), SEARCH_MAX_LIMIT)
+    stale = False
+    if cursor:
+        offset, stale = _decode_cursor(cursor, catalog)
+    else:
+        offset = max(int(offset or 0), 0)
+    total = int(rows.size)
     
-    # Remove internal score
-    for r in results:
-        r.pop('_score', None)
+    # Top-k by score (desc), then price (asc): a heap keeps only offset+limit entries,
+    # and only the products on the requested page are copied
+    prices = catalog.index.columns.price[rows]
+    top = heapq.nsmallest(offset + limit, zip((-scores).tolist(), prices.tolist(), rows.tolist()))
+    results = [dict(products[row]) for _, _, row in top[offset:]]
     
-    print(f"[SEARCH] Found {len(results)} products", file=sys.stderr)
+    # One line per search (the old per-call dump was eight)
+    logger.debug("search_products", extra={
+        "query": query, "category": normalized_category, "size": size, "budget_max": budget_max,
+        "avoid": preview(avoid_list), "catalog_version": catalog.version,
+        "total": total, "returned": len(results), "offset": offset
+    })
     
+    response = {
+        "products": results,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": _encode_cursor(offset + limit, catalog) if offset + limit < total else None,
+        "catalog_version": catalog.version
+    }
+    if stale:
+        response["cursor_stale"] = True
     if not results:
-        return {"message": "No products found.", "products": []}
-    
-    return {"products": results}
+        response["message"] = "No products found."
+    return response
 
 @mcp.tool()
 def get_product_details(product_id: str):
     """Fetches full metadata for a specific product ID."""
-    print(f"[DEBUG] get_product_details called for: {product_id}", file=sys.stderr)
-    products = _safe_load("catalog.json")
-    product = next((p for p in products if str(p.get("product_id")) == str(product_id)), None)
-    return product if product else {"error": "Product not found"}
+    logger.debug("get_product_details %s", product_id)
+    product = CATALOG.get().by_id.get(str(product_id))
+    return dict(product) if product else {"error": "Product not found"}
+
+@mcp.tool()
+def get_products(product_ids: list):
+    """
+    Fetches full metadata for several product IDs in one call.
+    Products are returned in the order requested; unknown IDs are listed in `missing`.
+    """
+    logger.debug("get_products for %d ids", len(product_ids))
+    by_id = CATALOG.get().by_id
+    products, missing = [], []
+    for pid in product_ids:
+        product = by_id.get(str(pid))
+        if product:
+            products.append(dict(product))
+        else:
+            missing.append(pid)
+    return {"products": products, "missing": missing}
+
+@mcp.tool()
+def get_catalog_version():
+    """Returns the current catalog version (changes whenever catalog.json content changes)."""
+    catalog = CATALOG.get()
+    return {"catalog_version": catalog.version, "product_count": len(catalog.products)}
 
 @mcp.tool()
 def save_shortlist(user_id: str, items: list):
     """Saves a user's shortlisted items to disk."""
-    print(f"[DEBUG] save_shortlist for user {user_id}: {items}", file=sys.stderr)
-    shortlists = _safe_load("shortlists.json", default={})
-    shortlists[user_id] = items
-    _safe_save("shortlists.json", shortlists)
+    logger.debug("save_shortlist for user %s", user_id, extra={"items": preview(items)})
+    STORAGE.save_shortlist(user_id, items)
     return {"status": "success", "message": f"Saved {len(items)} items to shortlist"}
 
 @mcp.tool()
 def get_shortlist(user_id: str):
     """Retrieves a user's previously saved shortlist."""
-    print(f"[DEBUG] get_shortlist for user {user_id}", file=sys.stderr)
-    shortlists = _safe_load("shortlists.json", default={})
-    return shortlists.get(user_id, [])
+    logger.debug("get_shortlist for user %s", user_id)
+    return STORAGE.get_shortlist(user_id)
 
 @mcp.tool()
 def write_memory(user_id: str, facts: list):
     """Updates user preferences (facts) in long-term memory."""
-    print(f"[DEBUG] write_memory for {user_id}: {facts}", file=sys.stderr)
-    memories = _safe_load("memory.json", default=[])
-    user_mem = next((m for m in memories if m.get("user_id") == user_id), {"user_id": user_id, "facts": []})
-    
+    logger.debug("write_memory for %s", user_id, extra={"facts": preview(facts)})
     # Merge new facts into the set of unique existing facts
-    user_mem["facts"] = list(set(user_mem["facts"] + facts))
-    
-    memories = [m for m in memories if m.get("user_id") != user_id]
-    memories.append(user_mem)
-    _safe_save("memory.json", memories)
-    return {"status": "success", "facts_count": len(user_mem["facts"])}
+    facts_count = STORAGE.merge_facts(user_id, facts)
+    return {"status": "success", "facts_count": facts_count}
 
 @mcp.tool()
 def read_memory(user_id: str):
     """Fetches stored preferences/facts for a specific user."""
-    print(f"[DEBUG] read_memory for {user_id}", file=sys.stderr)
-    memories = _safe_load("memory.json", default=[])
-    return next((m for m in memories if m.get("user_id") == user_id), {"user_id": user_id, "facts": []})
+    logger.debug("read_memory for %s", user_id)
+    return STORAGE.read_memory(user_id)
+
+def shutdown():
+    """Flush buffered memory/shortlist writes before the process exits."""
+    STORAGE.close()
 
 if __name__ == "__main__":
-    print("[DEBUG] Starting MCP server...", file=sys.stderr)
+    logger.info("Starting MCP server")
     # Start the FastMCP server with stdio transport
-    mcp.run(transport="stdio")
\ No newline at end of file
+    try:
+        mcp.run(transport="stdio")
+    finally:
+        shutdown()
\ No newline at end of file
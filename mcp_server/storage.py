@@ -0,0 +1,275 @@
+import os
+import json
+import logging
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class Storage(ABC):
+    """Persistence for per-user memory facts and shortlists."""
+
+    @abstractmethod
+    def read_memory(self, user_id: str) -> dict:
+        """Return {"user_id": ..., "facts": [...]} for the user."""
+        pass
+
+    @abstractmethod
+    def merge_facts(self, user_id: str, facts: list) -> int:
+        """Add facts to the user's set of unique facts; return the new fact count."""
+        pass
+
+    @abstractmethod
+    def get_shortlist(self, user_id: str) -> list:
+        pass
+
+    @abstractmethod
+    def save_shortlist(self, user_id: str, items: list):
+        """Replace the user's shortlist."""
+        pass
+
+    def apply_batch(self, fact_merges: dict, shortlists: dict):
+        """Apply many users' fact merges and shortlist replacements at once."""
+        for user_id, facts in fact_merges.items():
+            self.merge_facts(user_id, facts)
+        for user_id, items in shortlists.items():
+            self.save_shortlist(user_id, items)
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """
+    The original memory.json / shortlists.json layout, kept for development.
+    Every write rewrites the whole file, so it is only safe for one process.
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self._lock = threading.Lock()
+
+    def _safe_load(self, filename, default):
+        """Safely loads JSON data from the data directory."""
+        path = os.path.join(self.data_dir, filename)
+        if not os.path.exists(path):
+            logger.debug("File not found: %s", path)
+            return default
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+                logger.debug("Loaded %d items from %s", len(data), filename)
+                return data
+        except Exception as e:
+            logger.error("Error loading %s: %s", filename, e)
+            return default
+
+    def _safe_save(self, filename, data):
+        """Atomically persists JSON data (temp file + rename, so readers never see a partial file)."""
+        os.makedirs(self.data_dir, exist_ok=True)
+        path = os.path.join(self.data_dir, filename)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def read_memory(self, user_id):
+        memories = self._safe_load("memory.json", default=[])
+        return next((m for m in memories if m.get("user_id") == user_id), {"user_id": user_id, "facts": []})
+
+    def merge_facts(self, user_id, facts):
+        self.apply_batch({user_id: facts}, {})
+        return len(self.read_memory(user_id)["facts"])
+
+    def get_shortlist(self, user_id):
+        shortlists = self._safe_load("shortlists.json", default={})
+        return shortlists.get(user_id, [])
+
+    def save_shortlist(self, user_id, items):
+        self.apply_batch({}, {user_id: items})
+
+    def apply_batch(self, fact_merges, shortlists):
+        """One load + one rewrite per file, however many users changed."""
+        with self._lock:
+            if fact_merges:
+                memories = self._safe_load("memory.json", default=[])
+                by_user = {m.get("user_id"): m for m in memories}
+                for user_id, facts in fact_merges.items():
+                    user_mem = by_user.setdefault(user_id, {"user_id": user_id, "facts": []})
+                    # Merge new facts into the set of unique existing facts
+                    user_mem["facts"] = list(dict.fromkeys(user_mem["facts"] + list(facts)))
+                self._safe_save("memory.json", list(by_user.values()))
+            if shortlists:
+                stored = self._safe_load("shortlists.json", default={})
+                stored.update(shortlists)
+                self._safe_save("shortlists.json", stored)
+
+
+class SQLiteStorage(Storage):
+    """
+    Embedded SQLite (WAL mode) storage with one row per fact / per shortlist.
+
+    Writes are keyed upserts inside a transaction, so they cost the same no
+    matter how many users exist and are safe across threads and across the
+    pooled MCP server processes. Existing memory.json / shortlists.json data
+    is imported once, the first time the database is opened.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS facts (
+            user_id TEXT NOT NULL,
+            fact TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (user_id, fact)
+        );
+        CREATE TABLE IF NOT EXISTS shortlists (
+            user_id TEXT PRIMARY KEY,
+            items TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path: str, data_dir: str = None):
+        self.path = path
+        self.data_dir = data_dir or os.path.dirname(path)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        self._migrate_json(conn)
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections are not shareable)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def _migrate_json(self, conn):
+        """Import memory.json / shortlists.json once (BEGIN IMMEDIATE serializes racing processes)."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                conn.execute("COMMIT")
+                return
+            json_store = JsonStorage(self.data_dir)
+            now = time.time()
+            memories = json_store._safe_load("memory.json", default=[])
+            for mem in memories if isinstance(memories, list) else []:
+                for fact in mem.get("facts", []):
+                    conn.execute("INSERT OR IGNORE INTO facts VALUES (?, ?, ?)", (mem.get("user_id"), str(fact), now))
+            shortlists = json_store._safe_load("shortlists.json", default={})
+            for user_id, items in (shortlists.items() if isinstance(shortlists, dict) else []):
+                conn.execute("INSERT OR REPLACE INTO shortlists VALUES (?, ?, ?)", (user_id, json.dumps(items), now))
+            conn.execute("INSERT INTO meta VALUES ('json_migrated', ?)", (str(now),))
+            conn.execute("COMMIT")
+            logger.info("Migrated %d memories and %d shortlists into %s", len(memories), len(shortlists), self.path)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read_memory(self, user_id):
+        rows = self._conn().execute(
+            "SELECT fact FROM facts WHERE user_id = ? ORDER BY created_at, rowid", (user_id,)
+        ).fetchall()
+        return {"user_id": user_id, "facts": [r[0] for r in rows]}
+
+    def merge_facts(self, user_id, facts):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO facts VALUES (?, ?, ?)", [(user_id, str(f), now) for f in facts]
+            )
+            count = conn.execute("SELECT COUNT(*) FROM facts WHERE user_id = ?", (user_id,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def apply_batch(self, fact_merges, shortlists):
+        """All buffered changes in a single transaction."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO facts VALUES (?, ?, ?)",
+                [(user_id, str(f), now) for user_id, facts in fact_merges.items() for f in facts]
+            )
+            conn.executemany(
+                "INSERT INTO shortlists VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET items = excluded.items, updated_at = excluded.updated_at",
+                [(user_id, json.dumps(items), now) for user_id, items in shortlists.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_shortlist(self, user_id):
+        row = self._conn().execute("SELECT items FROM shortlists WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def save_shortlist(self, user_id, items):
+        self._conn().execute(
+            "INSERT INTO shortlists VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET items = excluded.items, updated_at = excluded.updated_at",
+            (user_id, json.dumps(items), time.time())
+        )
+
+
+def _single_storage_process() -> bool:
+    """
+    True when only one process serves storage calls: one uvicorn worker and
+    either in-process tools or a stdio pool of one server. Write-behind only
+    guarantees read-your-writes then; with several processes a read can land
+    on one that hasn't seen another's buffered write.
+    """
+    if int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+        return False
+    if os.getenv("TOOL_TRANSPORT", "stdio").lower() == "inprocess":
+        return True
+    return int(os.getenv("MCP_POOL_SIZE", 4)) == 1
+
+
+def create_storage(data_dir: str, backend: str = None, write_behind: bool = None) -> Storage:
+    """
+    Build the backend selected by STORAGE_BACKEND ("sqlite" or "json"), wrapped in
+    a write-behind buffer per WRITE_BEHIND: "auto" (default) buffers only when
+    this is the single process serving storage, "1" always, "0" never.
+    """
+    backend = (backend or os.getenv("STORAGE_BACKEND", "sqlite")).lower()
+    if backend == "json":
+        storage = JsonStorage(data_dir)
+    elif backend == "sqlite":
+        storage = SQLiteStorage(os.getenv("STORAGE_DB_PATH") or os.path.join(data_dir, "hushh.db"), data_dir)
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+    if write_behind is None:
+        setting = os.getenv("WRITE_BEHIND", "auto").lower()
+        if setting == "auto":
+            write_behind = _single_storage_process()
+        else:
+            write_behind = setting != "0"
+            if write_behind and not _single_storage_process():
+                logger.warning("WRITE_BEHIND=1 with several storage processes: "
+                               "a read may not see another process's buffered writes until it flushes")
+    if write_behind:
+        from mcp_server.write_behind import WriteBehindStorage
+        storage = WriteBehindStorage(storage)
+    return storage
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.append(os.getcwd())
+# Keep the server's storage and catalog out of data/
+os.environ.setdefault("HUSHH_DATA_DIR", tempfile.mkdtemp())
+
+from mcp_server import server
+from mcp_server.catalog_store import CatalogStore
+
+
+def _write_catalog(path, count, prefix):
+    products = [{"product_id": f"{prefix}-{i:03d}", "title": f"White sneakers {i}", "category": "footwear",
+                 "price_inr": 1000 + i, "size": "9"} for i in range(count)]
+    with open(path, "w") as f:
+        json.dump(products, f)
+
+
+def _use_catalog(count, prefix):
+    path = os.path.join(os.environ["HUSHH_DATA_DIR"], "catalog.json")
+    _write_catalog(path, count, prefix)
+    server.CATALOG = CatalogStore(path, check_interval=0)
+    return path
+
+
+def test_cursor_pages_through_results():
+    _use_catalog(12, "a")
+    first = server.search_products("sneakers", limit=5)
+    second = server.search_products("sneakers", limit=5, cursor=first["next_cursor"])
+    assert second["offset"] == 5
+    assert "cursor_stale" not in second
+    assert not {p["product_id"] for p in first["products"]} & {p["product_id"] for p in second["products"]}
+
+
+def test_cursor_across_catalog_reload_restarts():
+    path = _use_catalog(12, "a")
+    first = server.search_products("sneakers", limit=5)
+
+    time.sleep(0.01)  # a new mtime, so the store re-reads the file
+    _write_catalog(path, 15, "b")
+    server.CATALOG.get()  # starts the background reload
+    server.CATALOG.wait_for_reload(5)
+    page = server.search_products("sneakers", limit=5, cursor=first["next_cursor"])
+    assert page["cursor_stale"] is True
+    assert page["offset"] == 0
+    assert page["catalog_version"] == first["catalog_version"] + 1
+    assert page["products"][0]["product_id"].startswith("b-")
+
+
+def test_malformed_cursor_starts_at_first_page():
+    _use_catalog(12, "a")
+    page = server.search_products("sneakers", limit=5, cursor="not-a-cursor")
+    assert page["offset"] == 0
+    assert "cursor_stale" not in page
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
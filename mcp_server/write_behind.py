@@ -0,0 +1,120 @@
+import os
+import atexit
+import logging
+import threading
+from mcp_server.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindStorage(Storage):
+    """
+    Buffers memory and shortlist writes in front of another Storage.
+
+    Fact merges accumulate per user (as an ordered set) and shortlist saves
+    per user (last one wins), so repeated updates to the same user coalesce.
+    A background thread flushes everything in one `apply_batch` every
+    `flush_interval` seconds, sooner once `max_pending` users are dirty, and
+    on shutdown. Reads overlay the buffered state on the backend, so a user
+    always reads their own writes from this process. Other processes see
+    them after the next flush, which is why create_storage only enables it
+    (WRITE_BEHIND=auto) when a single process serves all storage calls.
+    """
+
+    def __init__(self, backend: Storage, flush_interval: float = None, max_pending: int = None):
+        self.backend = backend
+        self.flush_interval = flush_interval or float(os.getenv("WRITE_BEHIND_INTERVAL", 1.0))
+        self.max_pending = max_pending or int(os.getenv("WRITE_BEHIND_MAX_PENDING", 100))
+        self._facts = {}       # user_id -> {fact: None} (ordered set)
+        self._shortlists = {}  # user_id -> items
+        # Batch currently being written; still visible to readers until it lands
+        self._flushing_facts = {}
+        self._flushing_shortlists = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self.flushes = 0
+        self._thread = threading.Thread(target=self._flush_loop, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _pending_count(self):
+        return len(self._facts) + len(self._shortlists)
+
+    def read_memory(self, user_id):
+        # Snapshot the buffer before reading the backend so a flush landing in
+        # between can't hide the buffered facts from this read
+        with self._lock:
+            buffered = list(self._flushing_facts.get(user_id, ())) + list(self._facts.get(user_id, ()))
+        memory = self.backend.read_memory(user_id)
+        if buffered:
+            memory = {**memory, "facts": list(dict.fromkeys(list(memory.get("facts", [])) + buffered))}
+        return memory
+
+    def merge_facts(self, user_id, facts):
+        with self._lock:
+            pending = self._facts.setdefault(user_id, {})
+            for fact in facts:
+                pending[str(fact)] = None
+            full = self._pending_count() >= self.max_pending
+        if full:
+            self._wake.set()
+        return len(self.read_memory(user_id)["facts"])
+
+    def get_shortlist(self, user_id):
+        with self._lock:
+            if user_id in self._shortlists:
+                return list(self._shortlists[user_id])
+            if user_id in self._flushing_shortlists:
+                return list(self._flushing_shortlists[user_id])
+        return self.backend.get_shortlist(user_id)
+
+    def save_shortlist(self, user_id, items):
+        with self._lock:
+            self._shortlists[user_id] = list(items)
+            full = self._pending_count() >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write every buffered change to the backend in one batch."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._facts and not self._shortlists:
+                    return
+                self._flushing_facts, self._facts = self._facts, {}
+                self._flushing_shortlists, self._shortlists = self._shortlists, {}
+            try:
+                self.backend.apply_batch(
+                    {user_id: list(facts) for user_id, facts in self._flushing_facts.items()},
+                    self._flushing_shortlists,
+                )
+                self.flushes += 1
+            except Exception:
+                # Put the batch back (newer buffered writes take precedence) and retry next round
+                logger.exception("Write-behind flush failed, will retry")
+                with self._lock:
+                    for user_id, facts in self._flushing_facts.items():
+                        self._facts[user_id] = {**facts, **self._facts.get(user_id, {})}
+                    for user_id, items in self._flushing_shortlists.items():
+                        self._shortlists.setdefault(user_id, items)
+            finally:
+                with self._lock:
+                    self._flushing_facts, self._flushing_shortlists = {}, {}
+
+    def _flush_loop(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write out anything still buffered."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        self.backend.close()